@@ -0,0 +1,81 @@
+"""Compare payload codecs: bytes per reading and encode/decode time.
+
+Run with ``python -m benchmarks.codec_benchmark``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from iot_lab.codecs import PayloadCodec, decode_payload
+
+VARIANTS = [
+    ("json", None),
+    ("json", "zlib"),
+    ("msgpack", None),
+    ("msgpack", "zlib"),
+    ("cbor", None),
+    ("cbor", "zlib"),
+]
+
+
+def make_readings(count: int) -> list:
+    rng = random.Random(42)
+    start = 1730738800.0
+    return [
+        {
+            "device": "arduino1",
+            "sensor": rng.choice(["temperature", "humidity", "A0"]),
+            "value": round(rng.uniform(0, 1023), 2),
+            "timestamp": round(start + index / 1000, 6),
+            "seq": index,
+        }
+        for index in range(count)
+    ]
+
+
+def make_batches(readings: list, size: int) -> list:
+    return [{"readings": readings[i : i + size]} for i in range(0, len(readings), size)]
+
+
+def measure(codec: PayloadCodec, payloads: list, readings_per_payload: int) -> tuple:
+    started = time.perf_counter()
+    encoded = [codec.encode(payload) for payload in payloads]
+    encode_time = time.perf_counter() - started
+    started = time.perf_counter()
+    for data in encoded:
+        decode_payload(data)
+    decode_time = time.perf_counter() - started
+    readings = len(payloads) * readings_per_payload
+    size = sum(len(data) for data in encoded)
+    return size / readings, encode_time / readings * 1e6, decode_time / readings * 1e6
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--readings", type=int, default=20000)
+    arg_parser.add_argument("--batch", type=int, default=50, help="readings per batched payload")
+    args = arg_parser.parse_args()
+
+    readings = make_readings(args.readings)
+    batches = make_batches(readings, args.batch)
+    print(f"{'codec':<16}{'mode':<10}{'bytes/reading':>14}{'encode us':>12}{'decode us':>12}")
+    for name, compression in VARIANTS:
+        try:
+            codec = PayloadCodec(name, compression=compression, compress_min_bytes=256)
+        except ImportError as exc:
+            print(f"{name:<16}skipped: {exc}")
+            continue
+        label = name + ("+zlib" if compression else "")
+        for mode, payloads, per_payload in (
+            ("single", readings, 1),
+            (f"batch{args.batch}", batches, args.batch),
+        ):
+            size, encode_us, decode_us = measure(codec, payloads, per_payload)
+            print(f"{label:<16}{mode:<10}{size:>14.1f}{encode_us:>12.2f}{decode_us:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Compare per-refresh data preparation: full rebuild vs. incremental deltas.
+
+The full rebuild is what every Streamlit rerun did before the live panels
+became a fragment: build a DataFrame from the whole buffer and pivot it. The
+incremental path appends only the messages that arrived since the previous
+refresh to per-sensor arrays and reassembles the chart from them.
+
+Preparation is only part of what a viewer costs the server: every refresh
+also serialises the chart and sends it to the browser. The last row runs
+``st.line_chart`` on the final chart through Streamlit's ``AppTest`` and
+reports the server time of one such rerun, which is the same for both paths.
+
+Run with ``python -m benchmarks.dashboard_render_benchmark``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+from dashboard.live_frame import LiveFrame, chart_frame
+from dashboard.retention import RetainedBuffer
+
+SENSORS = ["temperature", "humidity", "A0", "A1"]
+
+
+def feed(buffer: RetainedBuffer, start: int, count: int) -> int:
+    for seq in range(start, start + count):
+        buffer.append(
+            {
+                "device": "arduino1",
+                "sensor": SENSORS[seq % len(SENSORS)],
+                "value": seq % 1024,
+                "timestamp": 1730738800 + seq / 1000,
+                "seq": seq,
+                "topic": "lab/device1/data",
+            }
+        )
+    return start + count
+
+
+def _chart_script() -> None:
+    import streamlit as st
+
+    st.line_chart(st.session_state.chart)
+
+
+def render(chart: pd.DataFrame, runs: int) -> float:
+    """Server milliseconds of one rerun that draws ``chart`` for a viewer."""
+
+    app = AppTest.from_function(_chart_script)
+    app.session_state["chart"] = chart
+    app.run()
+    started = time.perf_counter()
+    for _ in range(runs):
+        app.run()
+    return (time.perf_counter() - started) / runs * 1000
+
+
+def run(args: argparse.Namespace, incremental: bool) -> float:
+    buffer = RetainedBuffer(max_samples=args.history, per_sensor=args.per_sensor)
+    seq = feed(buffer, 0, args.history)
+    live_frame = LiveFrame(per_sensor=args.per_sensor)
+    live_frame.refresh(buffer)
+    live_frame.chart()
+    elapsed = 0.0
+    for _ in range(args.ticks):
+        seq = feed(buffer, seq, args.per_tick)
+        started = time.perf_counter()
+        if incremental:
+            live_frame.refresh(buffer)
+            live_frame.chart()
+        else:
+            chart_frame(pd.DataFrame(buffer.records()))
+        elapsed += time.perf_counter() - started
+    return elapsed / args.ticks * 1000
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--history", type=int, default=20000, help="messages retained")
+    arg_parser.add_argument("--per-sensor", type=int, default=None)
+    arg_parser.add_argument("--per-tick", type=int, default=100, help="new messages per refresh")
+    arg_parser.add_argument("--ticks", type=int, default=30)
+    args = arg_parser.parse_args()
+
+    full = run(args, incremental=False)
+    incremental = run(args, incremental=True)
+    args.per_tick = 0
+    idle_full = run(args, incremental=False)
+    idle_incremental = run(args, incremental=True)
+    print(f"{'refresh':<28}{'full ms':>10}{'incremental ms':>16}")
+    print(f"{'with new messages':<28}{full:>10.2f}{incremental:>16.2f}")
+    print(f"{'idle (no new messages)':<28}{idle_full:>10.2f}{idle_incremental:>16.2f}")
+
+    buffer = RetainedBuffer(max_samples=args.history, per_sensor=args.per_sensor)
+    feed(buffer, 0, args.history)
+    live_frame = LiveFrame(per_sensor=args.per_sensor)
+    live_frame.refresh(buffer)
+    drawn = render(live_frame.chart(), args.ticks)
+    print(f"{'chart render, per viewer':<28}{drawn:>10.2f}{drawn:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
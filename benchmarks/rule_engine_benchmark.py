@@ -0,0 +1,79 @@
+"""Measure rule evaluation cost per reading as the number of rules grows.
+
+Rules are spread over 20 sensors, or all put on one sensor with
+``--one-sensor``, mixing threshold, rate-of-change and stuck-value rules.
+
+Run with ``python -m benchmarks.rule_engine_benchmark``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from gateway.rules import Rule, RuleEngine
+
+SENSORS = [f"s{index}" for index in range(20)]
+
+
+def make_rules(count: int, sensors: list) -> list:
+    rng = random.Random(7)
+    rules = []
+    for index in range(count):
+        sensor = sensors[index % len(sensors)]
+        kind = ("threshold", "threshold", "rate", "stuck")[index % 4]
+        if kind == "stuck":
+            rules.append(Rule(f"r{index}", "stuck", sensor=sensor, duration=rng.uniform(1, 60)))
+        elif kind == "rate":
+            rules.append(Rule(f"r{index}", "rate", sensor=sensor, above=rng.uniform(600, 3000)))
+        else:
+            limit = rng.uniform(0, 1023)
+            rules.append(Rule(f"r{index}", sensor=sensor, above=limit, hysteresis=5.0))
+    return rules
+
+
+def make_readings(count: int, sensors: list) -> list:
+    rng = random.Random(42)
+    values = {sensor: 512.0 for sensor in sensors}
+    readings = []
+    for index in range(count):
+        sensor = sensors[index % len(sensors)]
+        # A random walk, so limits are crossed now and then like real signals
+        values[sensor] = min(1023.0, max(0.0, values[sensor] + rng.gauss(0, 4)))
+        readings.append(
+            {
+                "device": "arduino1",
+                "sensor": sensor,
+                "value": round(values[sensor], 1),
+                # Every sensor sampled at 50 Hz
+                "timestamp": 1730738800 + (index // len(sensors)) / 50,
+            }
+        )
+    return readings
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--readings", type=int, default=200000)
+    arg_parser.add_argument("--one-sensor", action="store_true", help="put every rule on one sensor")
+    args = arg_parser.parse_args()
+
+    sensors = SENSORS[:1] if args.one_sensor else SENSORS
+    readings = make_readings(args.readings, sensors)
+    print(f"{'rules':>6} {'us/reading':>11} {'readings/s':>11} {'alerts':>8}")
+    for count in (0, 10, 100, 1000):
+        engine = RuleEngine(make_rules(count, sensors))
+        started = time.perf_counter()
+        alerts = 0
+        for reading in readings:
+            alerts += len(engine.evaluate(reading))
+        elapsed = time.perf_counter() - started
+        print(
+            f"{count:>6} {elapsed / len(readings) * 1e6:>11.2f} "
+            f"{len(readings) / elapsed:>11.0f} {alerts:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,23 +2,46 @@
 
 from __future__ import annotations
 
+from typing import Optional
+
 import streamlit as st
 
 from iot_lab import configure_logging, load_config
 
 from .data_handler import MQTTDataHandler
+from .live_frame import LiveFrame
 from . import ui_components
 
 
+# ``st.fragment`` replaced ``st.experimental_fragment`` in later Streamlit releases
+_fragment = getattr(st, "fragment", None) or st.experimental_fragment
+
+
+def _optional_float(value) -> Optional[float]:
+    return float(value) if value else None
+
+
+def _optional_int(value) -> Optional[int]:
+    return int(value) if value else None
+
+
 def _initialise_handler(config) -> MQTTDataHandler:
     mqtt_cfg = config.get("mqtt", {})
     dashboard_cfg = config.get("dashboard", {})
+    retention_cfg = dashboard_cfg.get("retention") or {}
+    snapshot_cfg = dashboard_cfg.get("snapshot") or {}
     handler = MQTTDataHandler(
         host=mqtt_cfg.get("host", "localhost"),
         port=int(mqtt_cfg.get("port", 1883)),
         data_topic=mqtt_cfg.get("publish_topic", "lab/device1/data"),
         history_size=int(dashboard_cfg.get("history_size", 200)),
         csv_output=dashboard_cfg.get("csv_output"),
+        subscriptions=dashboard_cfg.get("subscriptions") or None,
+        max_age=_optional_float(retention_cfg.get("max_age_seconds")),
+        per_sensor_samples=_optional_int(retention_cfg.get("per_sensor_samples")),
+        max_mib=_optional_float(retention_cfg.get("max_mib")),
+        snapshot_path=snapshot_cfg.get("path"),
+        snapshot_interval=float(snapshot_cfg.get("interval", 30)),
     )
     handler.start()
     return handler
@@ -51,18 +74,45 @@ def main() -> None:
         else:
             st.warning("No data to export yet.")
 
+    filters = ui_components.render_subscription_filter(list(handler.topics))
+    if filters is not None:
+        try:
+            handler.set_subscriptions(filters)
+        except ValueError as exc:
+            st.error(str(exc))
+
     mqtt_cfg = config.get("mqtt", {})
+    dashboard_cfg = config.get("dashboard", {})
     ui_components.render_command_sender(
         command_topic=mqtt_cfg.get("command_topic", "lab/device1/cmd"),
-        broker=mqtt_cfg.get("host", "localhost"),
-        port=int(mqtt_cfg.get("port", 1883)),
+        send=handler.send_command,
     )
 
-    df = handler.to_dataframe()
-    latest = handler.latest_messages(3)
-    ui_components.render_metrics(latest)
-    ui_components.render_live_chart(df)
+    refresh_interval = float(dashboard_cfg.get("refresh_interval", 1.0))
+    live_panels = _fragment(run_every=refresh_interval)(_render_live_panels)
+    live_panels(handler, dashboard_cfg)
+
+
+def _render_live_panels(handler: MQTTDataHandler, dashboard_cfg) -> None:
+    """Data panels, rerun on their own timer without re-executing the page."""
+
+    if "live_frame" not in st.session_state:
+        st.session_state.live_frame = LiveFrame(per_sensor=handler.buffer.per_sensor)
+    live_frame: LiveFrame = st.session_state.live_frame
+    live_frame.refresh(handler.buffer)
+
+    ui_components.render_buffer_usage(len(handler.buffer), handler.buffer.memory_usage)
+    ui_components.render_metrics(
+        handler.latest.most_recent(int(dashboard_cfg.get("metric_tiles", 6)))
+    )
+    if ui_components.device_overview_toggle(len(handler.latest)):
+        ui_components.render_device_overview(
+            handler.latest.snapshot(),
+            stale_after=float(dashboard_cfg.get("stale_after", 10)),
+        )
+    ui_components.render_live_chart(live_frame.chart())
     ui_components.render_message_log(handler.latest_messages())
+    ui_components.render_stream_health(handler.sequences.stats())
 
 
 if __name__ == "__main__":
@@ -2,22 +2,45 @@
 
 from __future__ import annotations
 
-import json
 import logging
 import threading
 import time
-from collections import deque
 from pathlib import Path
-from typing import Deque, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 import pandas as pd
 import paho.mqtt.client as mqtt
 
+from iot_lab import decode_payload
+
+from .latest_index import LatestValueIndex
+from .retention import RetainedBuffer
+from .sequence_tracker import DUPLICATE, SequenceTracker
+from .snapshots import load_snapshot, save_snapshot
+from .topic_index import TopicTrie, validate_filter
+
 LOGGER = logging.getLogger(__name__)
 
 
 class MQTTDataHandler:
-    """Subscribe to an MQTT topic and maintain a rolling buffer of messages."""
+    """Subscribe to MQTT topic filters and maintain a rolling buffer of messages.
+
+    By default the handler subscribes to ``<data_topic>/#`` which covers both
+    the shared device topic and per-sensor topics below it. Pass
+    ``subscriptions`` to let the broker deliver only a subset of sensors or
+    devices.
+
+    Retention is bounded by ``history_size`` messages in total and optionally
+    by ``max_age`` seconds, ``per_sensor_samples`` per device/sensor and
+    ``max_mib`` of memory, whichever is reached first.
+
+    With ``snapshot_path`` set, the buffer and the latest-value and sequence
+    rollups are saved every ``snapshot_interval`` seconds and on :meth:`stop`,
+    and loaded again by :meth:`start` before subscribing, so a restarted
+    dashboard shows its history straight away. Messages the broker delivers
+    again after the restart are dropped by sequence number, or by timestamp
+    for messages without a gateway session.
+    """
 
     def __init__(
         self,
@@ -26,60 +49,222 @@ class MQTTDataHandler:
         data_topic: str,
         history_size: int = 200,
         csv_output: str | None = None,
+        subscriptions: Optional[Iterable[str]] = None,
+        max_age: Optional[float] = None,
+        per_sensor_samples: Optional[int] = None,
+        max_mib: Optional[float] = None,
+        snapshot_path: str | None = None,
+        snapshot_interval: float = 30.0,
     ) -> None:
         self.host = host
         self.port = port
         self.data_topic = data_topic
+        self.topics = TopicTrie(list(subscriptions or [f"{data_topic}/#"]))
         self.history_size = history_size
         self.csv_output = csv_output
-        self.buffer: Deque[Dict[str, object]] = deque(maxlen=history_size)
+        self.buffer = RetainedBuffer(
+            max_samples=history_size,
+            max_age=max_age,
+            per_sensor=per_sensor_samples,
+            max_bytes=int(max_mib * 1024 * 1024) if max_mib else None,
+        )
         self.capture_enabled = True
+        self.sequences = SequenceTracker()
+        self.latest = LatestValueIndex()
         self._client = mqtt.Client()
         self._client.on_connect = self._on_connect
         self._client.on_message = self._on_message
-        self._thread: Optional[threading.Thread] = None
+        self._client.on_disconnect = self._on_disconnect
+        # paho reconnects by itself in its ``loop_start`` thread
+        self._client.reconnect_delay_set(min_delay=1, max_delay=30)
+        self._started = False
         self._connected = threading.Event()
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self._snapshot_stop = threading.Event()
+        # Newest restored timestamp per sensor, for messages without ``session``
+        self._restored_until: Dict[Tuple[Any, Any], float] = {}
 
     def _on_connect(self, client: mqtt.Client, _userdata, _flags, rc):  # type: ignore[override]
         if rc == 0:
             LOGGER.info("Dashboard connected to MQTT at %s:%s", self.host, self.port)
-            client.subscribe(self.data_topic)
+            filters = list(self.topics)
+            if filters:
+                client.subscribe([(topic_filter, 0) for topic_filter in filters])
             self._connected.set()
         else:
             LOGGER.error("Dashboard MQTT connection failed with code %s", rc)
 
+    def _on_disconnect(self, _client: mqtt.Client, _userdata, rc):  # type: ignore[override]
+        self._connected.clear()
+        if rc != 0:
+            LOGGER.warning("Dashboard MQTT connection lost (code %s); reconnecting", rc)
+
     def _on_message(self, _client: mqtt.Client, _userdata, msg):  # type: ignore[override]
         if not self.capture_enabled:
             return
-        payload = msg.payload.decode("utf-8", errors="ignore")
+        # Drop messages still in flight for filters that were just removed
+        if not self.topics.matches(msg.topic):
+            return
         try:
-            data = json.loads(payload)
+            data = decode_payload(msg.payload)
             if not isinstance(data, dict):
-                raise ValueError("Payload must be a JSON object")
-        except (json.JSONDecodeError, ValueError):
-            data = {"sensor": "raw", "value": payload}
+                raise ValueError("Payload must be an object")
+        except (ValueError, ImportError):
+            data = {"sensor": "raw", "value": msg.payload.decode("utf-8", errors="ignore")}
+        session = data.get("session")
+        if session is None and self._restored_until and self._is_restored(data):
+            return
+        seq = data.get("seq")
+        if isinstance(seq, int) and not isinstance(seq, bool):
+            if self.sequences.observe(data.get("device"), seq, session) == DUPLICATE:
+                return
         data.setdefault("timestamp", time.time())
         data.setdefault("topic", msg.topic)
         self.buffer.append(data)
+        self.latest.update(data)
+
+    def _is_restored(self, data: Dict[str, Any]) -> bool:
+        timestamp = data.get("timestamp")
+        until = self._restored_until.get((data.get("device"), data.get("sensor")))
+        return until is not None and isinstance(timestamp, (int, float)) and timestamp <= until
 
     def start(self) -> None:
-        if self._thread and self._thread.is_alive():
+        if self._started:
             return
-        LOGGER.info("Starting MQTT data handler for topic %s", self.data_topic)
-        self._client.connect(self.host, self.port, keepalive=60)
-        self._thread = threading.Thread(target=self._client.loop_forever, daemon=True)
-        self._thread.start()
+        if self.snapshot_path:
+            if not self.buffer:
+                self.restore_snapshot()
+            self._start_snapshots()
+        LOGGER.info("Starting MQTT data handler for %s", ", ".join(self.topics))
+        self._client.connect_async(self.host, self.port, keepalive=60)
+        # paho's threaded loop, so commands can be published from the Streamlit thread
+        self._client.loop_start()
+        self._started = True
         self._connected.wait(timeout=5)
 
     def stop(self) -> None:
-        if not self._thread:
+        if not self._started:
             return
         LOGGER.info("Stopping MQTT data handler")
-        self._client.loop_stop()
         self._client.disconnect()
-        self._thread.join(timeout=1)
-        self._thread = None
+        self._client.loop_stop()
+        self._started = False
         self._connected.clear()
+        if self._snapshot_thread is not None:
+            self._snapshot_stop.set()
+            self._snapshot_thread.join(timeout=1)
+            self._snapshot_thread = None
+            self.save_snapshot()
+
+    def _start_snapshots(self) -> None:
+        if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+            return
+        self._snapshot_stop.clear()
+        self._snapshot_thread = threading.Thread(
+            target=self._snapshot_loop, name="dashboard-snapshot", daemon=True
+        )
+        self._snapshot_thread.start()
+
+    def _snapshot_loop(self) -> None:
+        while not self._snapshot_stop.wait(self.snapshot_interval):
+            self.save_snapshot()
+
+    def save_snapshot(self) -> Optional[Path]:
+        """Write the buffer and rollups to ``snapshot_path``."""
+
+        if not self.snapshot_path:
+            return None
+        try:
+            # Each call copies its state under the owner's lock
+            path = save_snapshot(
+                self.snapshot_path,
+                self.buffer.entries(),
+                self.latest.export(),
+                self.sequences.stats(),
+            )
+        except Exception:  # noqa: BLE001 - a failed save must not stop the snapshot thread
+            LOGGER.exception("Failed to save dashboard snapshot to %s", self.snapshot_path)
+            return None
+        LOGGER.debug("Saved dashboard snapshot to %s", path)
+        return path
+
+    def restore_snapshot(self) -> int:
+        """Load ``snapshot_path`` into the buffers; returns the messages restored."""
+
+        if not self.snapshot_path:
+            return 0
+        started = time.perf_counter()
+        try:
+            snapshot = load_snapshot(self.snapshot_path)
+        except (OSError, ValueError, KeyError) as exc:
+            LOGGER.warning("Ignoring unreadable dashboard snapshot %s: %s", self.snapshot_path, exc)
+            return 0
+        if snapshot is None:
+            return 0
+        try:
+            self.latest.restore(snapshot.latest)
+            self.sequences.restore(snapshot.sequences)
+        except (AttributeError, KeyError, TypeError, ValueError) as exc:
+            # An older or partial rollup; start empty rather than half restored
+            LOGGER.warning("Ignoring unreadable dashboard snapshot %s: %s", self.snapshot_path, exc)
+            self.latest.clear()
+            self.sequences.clear()
+            return 0
+        for received_at, record in snapshot.entries:
+            self.buffer.append(record, received_at=received_at)
+            if record.get("session") is None:
+                key = (record.get("device"), record.get("sensor"))
+                timestamp = record.get("timestamp")
+                if isinstance(timestamp, (int, float)):
+                    self._restored_until[key] = max(timestamp, self._restored_until.get(key, timestamp))
+        LOGGER.info(
+            "Restored %s messages from %s in %.0f ms",
+            len(snapshot),
+            self.snapshot_path,
+            (time.perf_counter() - started) * 1000,
+        )
+        return len(snapshot)
+
+    def send_command(self, topic: str, command: str, qos: int = 1) -> bool:
+        """Publish ``command`` on the handler's open connection.
+
+        The dashboard only subscribes on this connection, so nothing outbound
+        is queued ahead of the command and no connection has to be opened per
+        command. The client runs paho's threaded loop, so this is safe to call
+        from the UI thread. Returns ``False`` when not connected.
+        """
+
+        if not self._connected.is_set():
+            return False
+        info = self._client.publish(topic, command, qos=qos)
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            LOGGER.error("Failed to send command %r: %s", command, mqtt.error_string(info.rc))
+            return False
+        LOGGER.info("Sent command %r to %s", command, topic)
+        return True
+
+    def set_subscriptions(self, filters: Iterable[str]) -> None:
+        """Replace the active topic filters, updating the broker subscription."""
+
+        wanted = set(filters)
+        for topic_filter in wanted:
+            validate_filter(topic_filter)
+        current = set(self.topics)
+        removed = sorted(current - wanted)
+        added = sorted(wanted - current)
+        for topic_filter in removed:
+            self.topics.remove(topic_filter)
+        for topic_filter in added:
+            self.topics.add(topic_filter)
+        if self._connected.is_set():
+            if removed:
+                self._client.unsubscribe(removed)
+            if added:
+                self._client.subscribe([(topic_filter, 0) for topic_filter in added])
+        if removed or added:
+            LOGGER.info("Subscriptions updated: +%s -%s", added, removed)
 
     def set_capture(self, enabled: bool) -> None:
         LOGGER.info("Data capture %s", "enabled" if enabled else "paused")
@@ -87,11 +272,14 @@ class MQTTDataHandler:
 
     def clear(self) -> None:
         self.buffer.clear()
+        self.sequences.clear()
+        self.latest.clear()
+        self._restored_until.clear()
 
     def to_dataframe(self) -> pd.DataFrame:
         if not self.buffer:
-            return pd.DataFrame(columns=["timestamp", "sensor", "value", "topic", "device"])
-        return pd.DataFrame(list(self.buffer))
+            return pd.DataFrame(columns=["timestamp", "sensor", "value", "topic", "device", "seq"])
+        return pd.DataFrame(self.buffer.records())
 
     def save_to_csv(self) -> Optional[Path]:
         if not self.csv_output:
@@ -106,4 +294,5 @@ class MQTTDataHandler:
         return output_path
 
     def latest_messages(self, limit: int = 20) -> List[Dict[str, object]]:
-        return list(self.buffer)[-limit:]
+        # Walks back from the newest entry instead of copying the whole buffer
+        return self.buffer.newest(limit)[::-1]
@@ -0,0 +1,137 @@
+"""Latest value per (device, sensor) for metrics tiles and overviews."""
+
+from __future__ import annotations
+
+import heapq
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class LatestValue:
+    """Most recent reading of one sensor plus its arrival statistics."""
+
+    __slots__ = ("device", "sensor", "value", "timestamp", "received_at", "count", "interval")
+
+    def __init__(self, device: Any, sensor: Any) -> None:
+        self.device = device
+        self.sensor = sensor
+        self.value: Any = None
+        self.timestamp: Optional[float] = None
+        self.received_at = 0.0
+        self.count = 0
+        # Smoothed seconds between messages; ``None`` until two have arrived
+        self.interval: Optional[float] = None
+
+    @property
+    def rate(self) -> float:
+        """Estimated messages per second."""
+
+        return 1.0 / self.interval if self.interval else 0.0
+
+    def as_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "device": self.device,
+            "sensor": self.sensor,
+            "value": self.value,
+            "timestamp": self.timestamp,
+            "count": self.count,
+            "rate": self.rate,
+            "staleness": max(0.0, now - self.received_at),
+        }
+
+
+class LatestValueIndex:
+    """O(1) per-message cache of the latest value of every device/sensor pair.
+
+    Readers never scan the message history: tiles and overviews read the
+    cached entries, whose number is bounded by the number of sensors rather
+    than by the message rate. The rate is an exponentially weighted average
+    of the inter-arrival time (``alpha`` is the weight of the newest gap).
+    Updates arrive on the MQTT thread, so readers copy under a lock.
+    """
+
+    def __init__(self, alpha: float = 0.2, clock: Callable[[], float] = time.time) -> None:
+        self.alpha = alpha
+        self.clock = clock
+        self._entries: Dict[Hashable, LatestValue] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def update(self, record: Dict[str, Any]) -> LatestValue:
+        device = record.get("device")
+        sensor = record.get("sensor")
+        key: Tuple[Any, Any] = (device, sensor)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = LatestValue(device, sensor)
+            elif now > entry.received_at:
+                gap = now - entry.received_at
+                entry.interval = gap if entry.interval is None else (
+                    entry.interval + self.alpha * (gap - entry.interval)
+                )
+            entry.value = record.get("value")
+            entry.timestamp = record.get("timestamp")
+            entry.received_at = now
+            entry.count += 1
+        return entry
+
+    def get(self, device: Any, sensor: Any) -> Optional[LatestValue]:
+        return self._entries.get((device, sensor))
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """All entries as dictionaries, sorted by device and sensor."""
+
+        now = self.clock()
+        with self._lock:
+            rows = [entry.as_dict(now) for entry in self._entries.values()]
+        rows.sort(key=lambda row: (str(row["device"]), str(row["sensor"])))
+        return rows
+
+    def most_recent(self, limit: int) -> List[Dict[str, Any]]:
+        """The ``limit`` most recently updated entries, newest first."""
+
+        now = self.clock()
+        with self._lock:
+            entries = heapq.nlargest(limit, self._entries.values(), key=lambda entry: entry.received_at)
+            return [entry.as_dict(now) for entry in entries]
+
+    def export(self) -> List[Dict[str, Any]]:
+        """Raw state of every entry, for :meth:`restore`."""
+
+        with self._lock:
+            return [
+                {name: getattr(entry, name) for name in LatestValue.__slots__}
+                for entry in self._entries.values()
+            ]
+
+    def restore(self, states: List[Dict[str, Any]]) -> None:
+        """Load entries saved with :meth:`export`; newer existing entries win.
+
+        Every state is checked before any is applied, so an incomplete one
+        raises :class:`KeyError`, :class:`TypeError` or :class:`ValueError`
+        and leaves the index unchanged.
+        """
+
+        restored = []
+        for state in states:
+            entry = LatestValue(state["device"], state["sensor"])
+            for name in LatestValue.__slots__:
+                setattr(entry, name, state[name])
+            entry.received_at = float(entry.received_at)
+            entry.count = int(entry.count)
+            restored.append(entry)
+        with self._lock:
+            for entry in restored:
+                key = (entry.device, entry.sensor)
+                current = self._entries.get(key)
+                if current is None or current.received_at < entry.received_at:
+                    self._entries[key] = entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,211 @@
+"""Incrementally maintained chart data for the live dashboard panels."""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .retention import RetainedBuffer
+
+NAN = float("nan")
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def chart_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Pivot buffered messages into one column per sensor indexed by time.
+
+    Messages without a numeric value or timestamp are left out.
+    """
+
+    if df.empty:
+        return pd.DataFrame()
+    chart_df = df[["timestamp", "sensor", "value"]]
+    chart_df = chart_df[chart_df["value"].map(_is_number) & chart_df["timestamp"].map(_is_number)]
+    if chart_df.empty:
+        return pd.DataFrame()
+    chart_df = chart_df.assign(
+        time=pd.to_datetime(chart_df["timestamp"], unit="s"), value=chart_df["value"].astype(float)
+    )
+    # Same result as pivot_table(aggfunc="last") with far less fixed overhead
+    return chart_df.groupby(["time", "sensor"])["value"].last().unstack()
+
+
+class _Points:
+    """Arrival cursors, timestamps and values of one device/sensor, oldest first.
+
+    The live points are always the contiguous slice ``[start:end]`` of three
+    numpy arrays: appends write past ``end``, evictions advance ``start``, and
+    the slice is moved back to the front when the arrays are full, so both
+    are amortised O(1) per point and reading the points copies nothing.
+    """
+
+    __slots__ = ("cursors", "times", "values", "start", "end")
+
+    def __init__(self, capacity: int = 64) -> None:
+        self.cursors = np.empty(capacity, dtype=np.int64)
+        self.times = np.empty(capacity, dtype=np.float64)
+        self.values = np.empty(capacity, dtype=np.float64)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def extend(self, cursors: List[int], times: List[float], values: List[float]) -> None:
+        count = len(cursors)
+        if self.end + count > len(self.cursors):
+            self._make_room(count)
+        end = self.end + count
+        self.cursors[self.end : end] = cursors
+        self.times[self.end : end] = times
+        self.values[self.end : end] = values
+        self.end = end
+
+    def _make_room(self, count: int) -> None:
+        live = len(self)
+        capacity = len(self.cursors)
+        if live + count > capacity // 2:
+            capacity = max(64, 2 * (live + count))
+        for name in ("cursors", "times", "values"):
+            old = getattr(self, name)
+            new = old if capacity == len(old) else np.empty(capacity, dtype=old.dtype)
+            # ``copyto`` handles the overlap when moving within the same array
+            np.copyto(new[:live], old[self.start : self.end])
+            setattr(self, name, new)
+        self.start, self.end = 0, live
+
+    def evict_before(self, cursor: int) -> bool:
+        """Drop points older than ``cursor``; returns whether any were dropped."""
+
+        if self.start == self.end or self.cursors[self.start] >= cursor:
+            return False
+        self.start += int(np.searchsorted(self.cursors[self.start : self.end], cursor))
+        return True
+
+    def keep_last(self, limit: int) -> bool:
+        if len(self) <= limit:
+            return False
+        self.start = self.end - limit
+        return True
+
+    def view(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return (
+            self.cursors[self.start : self.end],
+            self.times[self.start : self.end],
+            self.values[self.start : self.end],
+        )
+
+
+class LiveFrame:
+    """Mirror the numeric readings of a :class:`RetainedBuffer` as chart data.
+
+    Each :meth:`refresh` reads only the messages that arrived since the
+    previous call and appends them to the bounded points of their
+    device/sensor (see :class:`_Points`), then drops the points the buffer
+    has since evicted: the oldest retained cursor covers count, age and
+    memory limits, and ``per_sensor`` the per-sensor limit. :meth:`chart`
+    assembles the time-by-sensor frame from those arrays with numpy and
+    reuses it until a refresh changes something; no DataFrame is
+    concatenated or grouped per refresh.
+    """
+
+    def __init__(self, per_sensor: Optional[int] = None) -> None:
+        self.per_sensor = per_sensor
+        self.cursor = 0
+        self.epoch: Optional[int] = None
+        self._points: Dict[Hashable, _Points] = {}
+        self._chart: Optional[pd.DataFrame] = None
+
+    def __len__(self) -> int:
+        return sum(len(points) for points in self._points.values())
+
+    def refresh(self, buffer: RetainedBuffer) -> bool:
+        """Pull new messages from ``buffer``; returns whether the chart changed."""
+
+        changed = False
+        if self.epoch != buffer.epoch:
+            self.epoch = buffer.epoch
+            self.cursor = 0
+            self._points.clear()
+            changed = True
+        delta, last_cursor, first_cursor = buffer.since(self.cursor)
+        self.cursor = last_cursor
+
+        batches: Dict[Hashable, Tuple[List[int], List[float], List[float]]] = {}
+        for cursor, record in delta:
+            value = record.get("value")
+            timestamp = record.get("timestamp")
+            key = (record.get("device"), record.get("sensor"))
+            batch = batches.get(key)
+            if batch is None:
+                batch = batches[key] = ([], [], [])
+            batch[0].append(cursor)
+            # NaN rather than skipped, so ``per_sensor`` trims the same messages as the buffer
+            batch[1].append(timestamp if _is_number(timestamp) else NAN)
+            batch[2].append(value if _is_number(value) else NAN)
+        for key, (cursors, times, values) in batches.items():
+            points = self._points.get(key)
+            if points is None:
+                points = self._points[key] = _Points()
+            points.extend(cursors, times, values)
+            if self.per_sensor:
+                points.keep_last(self.per_sensor)
+            changed = True
+
+        for key in list(self._points):
+            points = self._points[key]
+            if points.evict_before(first_cursor):
+                changed = True
+                if not points:
+                    del self._points[key]
+        if changed:
+            self._chart = None
+        return changed
+
+    def chart(self) -> pd.DataFrame:
+        if self._chart is None:
+            self._chart = self._assemble()
+        return self._chart
+
+    def _assemble(self) -> pd.DataFrame:
+        if not self._points:
+            return pd.DataFrame()
+        # Devices reporting the same sensor name share its column
+        columns: Dict[Any, List[Tuple[np.ndarray, np.ndarray, np.ndarray]]] = {}
+        for (_device, sensor), points in self._points.items():
+            columns.setdefault(sensor, []).append(points.view())
+        names: List[Any] = []
+        parts: List[Tuple[np.ndarray, np.ndarray]] = []
+        for sensor, views in columns.items():
+            if len(views) == 1:
+                _cursors, times, values = views[0]
+            else:
+                cursors, times, values = (np.concatenate(arrays) for arrays in zip(*views))
+                # Arrival order, so the newest value wins where timestamps coincide
+                order = np.argsort(cursors, kind="stable")
+                times, values = times[order], values[order]
+            plotted = ~(np.isnan(times) | np.isnan(values))
+            if not plotted.all():
+                times, values = times[plotted], values[plotted]
+            if len(times):
+                names.append(sensor)
+                parts.append((times, values))
+        if not parts:
+            return pd.DataFrame()
+        all_times = np.concatenate([times for times, _ in parts])
+        unique_times, rows = np.unique(all_times, return_inverse=True)
+        matrix = np.full((len(unique_times), len(parts)), np.nan)
+        offset = 0
+        for column, (times, values) in enumerate(parts):
+            matrix[rows[offset : offset + len(times)], column] = values
+            offset += len(times)
+        return pd.DataFrame(
+            matrix,
+            index=pd.DatetimeIndex(pd.to_datetime(unique_times, unit="s"), name="time"),
+            columns=pd.Index(names, name="sensor"),
+        )
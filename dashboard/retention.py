@@ -0,0 +1,237 @@
+"""Message buffer with time, per-sensor and memory based retention."""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, Iterator, List, Optional, Tuple
+
+
+def estimate_size(record: Dict[str, Any]) -> int:
+    """Approximate memory held by one buffered record, in bytes.
+
+    Counts the dict and its values; keys are shared between records (they are
+    interned by the JSON decoder) so they are left out.
+    """
+
+    return sys.getsizeof(record) + sum(sys.getsizeof(value) for value in record.values())
+
+
+class _Entry:
+    __slots__ = ("record", "key", "size", "received_at", "alive", "cursor")
+
+    def __init__(
+        self, record: Dict[str, Any], key: Hashable, size: int, received_at: float, cursor: int
+    ) -> None:
+        # ``None`` once the entry is dead, so it does not hold the record until compaction
+        self.record: Optional[Dict[str, Any]] = record
+        self.key = key
+        self.size = size
+        self.received_at = received_at
+        self.alive = True
+        self.cursor = cursor
+
+
+_ENTRY_OVERHEAD = sys.getsizeof(_Entry({}, None, 0, 0.0, 0))
+
+
+class RetainedBuffer:
+    """Rolling message buffer enforcing several retention rules on each append.
+
+    * ``max_samples``: total messages kept
+    * ``max_age``: seconds a message is kept after it was received
+    * ``per_sensor``: messages kept per (device, sensor), so a chatty sensor
+      cannot push the history of slow sensors out
+    * ``max_bytes``: approximate memory budget for the buffered records
+
+    Messages live in one arrival-ordered deque plus one deque per sensor.
+    Global rules pop from the left of the arrival deque; the per-sensor rule
+    pops from the sensor's deque and only marks the entry dead in the arrival
+    deque, which is compacted once dead entries outnumber live ones. Every
+    rule therefore costs amortised O(1) per append.
+
+    Each appended message gets an increasing cursor so readers can fetch only
+    what arrived since their last read with :meth:`since`. ``epoch`` changes
+    whenever the buffer is cleared.
+    """
+
+    def __init__(
+        self,
+        max_samples: Optional[int] = None,
+        max_age: Optional[float] = None,
+        per_sensor: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_samples = max_samples or None
+        self.max_age = max_age or None
+        self.per_sensor = per_sensor or None
+        self.max_bytes = max_bytes or None
+        self.clock = clock
+        self._entries: Deque[_Entry] = deque()
+        self._by_sensor: Dict[Hashable, Deque[_Entry]] = {}
+        self._live = 0
+        self._dead = 0
+        self._bytes = 0
+        self._next_cursor = 1
+        self.epoch = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._live
+
+    def __bool__(self) -> bool:
+        return self._live > 0
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.records())
+
+    def __reversed__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.newest())
+
+    @property
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the buffered records."""
+
+        return self._bytes
+
+    def entries(self) -> List[Tuple[float, Dict[str, Any]]]:
+        """Snapshot of ``(received_at, record)`` for the live records, oldest first."""
+
+        with self._lock:
+            if self.max_age:
+                self._evict_expired(self.clock())
+            return [(entry.received_at, entry.record) for entry in self._entries if entry.alive]
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Snapshot of the live records, oldest first."""
+
+        with self._lock:
+            if self.max_age:
+                self._evict_expired(self.clock())
+            return [entry.record for entry in self._entries if entry.alive]
+
+    def newest(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Up to ``limit`` live records, newest first.
+
+        Walks back from the newest entry, so reading the last few messages
+        does not visit the rest of the buffer.
+        """
+
+        with self._lock:
+            if self.max_age:
+                self._evict_expired(self.clock())
+            newest: List[Dict[str, Any]] = []
+            if limit is not None and limit <= 0:
+                return newest
+            for entry in reversed(self._entries):
+                if entry.alive:
+                    newest.append(entry.record)
+                    if len(newest) == limit:
+                        break
+            return newest
+
+    def append(self, record: Dict[str, Any], received_at: Optional[float] = None) -> None:
+        """Add ``record``; ``received_at`` (default: now) is only passed when
+        restoring messages that were received earlier."""
+
+        now = self.clock()
+        key = (record.get("device"), record.get("sensor"))
+        with self._lock:
+            entry = _Entry(
+                record,
+                key,
+                estimate_size(record) + _ENTRY_OVERHEAD,
+                now if received_at is None else received_at,
+                self._next_cursor,
+            )
+            self._next_cursor += 1
+            self._entries.append(entry)
+            sensor_entries = self._by_sensor.get(key)
+            if sensor_entries is None:
+                sensor_entries = self._by_sensor[key] = deque()
+            sensor_entries.append(entry)
+            self._live += 1
+            self._bytes += entry.size
+
+            if self.per_sensor and len(sensor_entries) > self.per_sensor:
+                self._kill(sensor_entries.popleft())
+                self._dead += 1
+            if self.max_age:
+                self._evict_expired(now)
+            while self.max_samples and self._live > self.max_samples:
+                self._evict_oldest()
+            while self.max_bytes and self._bytes > self.max_bytes and self._live > 1:
+                self._evict_oldest()
+            if self._dead > 1024 and self._dead > self._live:
+                self._entries = deque(entry for entry in self._entries if entry.alive)
+                self._dead = 0
+
+    def since(self, cursor: int) -> Tuple[List[Tuple[int, Dict[str, Any]]], int, int]:
+        """Live records appended after ``cursor``, oldest first.
+
+        Returns ``(delta, last_cursor, first_live_cursor)``: the new
+        ``(cursor, record)`` pairs, the cursor to pass next time, and the
+        cursor of the oldest message still retained (everything older was
+        evicted). Only the new part of the buffer is visited.
+        """
+
+        with self._lock:
+            if self.max_age:
+                self._evict_expired(self.clock())
+            delta: List[Tuple[int, Dict[str, Any]]] = []
+            for entry in reversed(self._entries):
+                if entry.cursor <= cursor:
+                    break
+                if entry.alive:
+                    delta.append((entry.cursor, entry.record))
+            delta.reverse()
+            first = self._first_live()
+            first_cursor = first.cursor if first is not None else self._next_cursor
+            return delta, self._next_cursor - 1, first_cursor
+
+    def clear(self) -> None:
+        with self._lock:
+            self.epoch += 1
+            self._entries.clear()
+            self._by_sensor.clear()
+            self._live = 0
+            self._dead = 0
+            self._bytes = 0
+
+    def _kill(self, entry: _Entry) -> None:
+        entry.alive = False
+        entry.record = None
+        self._live -= 1
+        self._bytes -= entry.size
+
+    def _first_live(self) -> Optional[_Entry]:
+        while self._entries:
+            entry = self._entries[0]
+            if entry.alive:
+                return entry
+            self._entries.popleft()
+            self._dead -= 1
+        return None
+
+    def _evict_oldest(self) -> None:
+        entry = self._first_live()
+        if entry is None:
+            return
+        self._entries.popleft()
+        # The globally oldest entry is also the oldest of its sensor
+        sensor_entries = self._by_sensor[entry.key]
+        sensor_entries.popleft()
+        if not sensor_entries:
+            del self._by_sensor[entry.key]
+        self._kill(entry)
+
+    def _evict_expired(self, now: float) -> None:
+        cutoff = now - self.max_age
+        while True:
+            entry = self._first_live()
+            if entry is None or entry.received_at >= cutoff:
+                return
+            self._evict_oldest()
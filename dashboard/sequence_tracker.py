@@ -0,0 +1,107 @@
+"""Per-device sequence tracking to detect gaps and duplicates."""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Optional
+
+OK = "ok"
+GAP = "gap"
+DUPLICATE = "duplicate"
+RESET = "reset"
+
+_COUNTERS = ("received", "gaps", "missing", "duplicates", "resets")
+
+
+class SequenceTracker:
+    """Classify each message by its per-device ``seq`` number.
+
+    The gateway numbers messages per device from 0 and tags them with a
+    ``session`` that changes whenever it restarts, so a new session is a
+    restart even if its first messages were missed. Without a session, a 0
+    after higher numbers or a jump back by more than ``reorder_window`` also
+    counts as a restart; smaller steps back are duplicates. Gap counts assume
+    the dashboard receives every sensor of a device (i.e. its subscriptions
+    are not narrowed to a subset of that device's sensors).
+
+    :meth:`restore` keeps ``last_seq`` only for devices whose session is
+    known; otherwise the next message starts the count afresh.
+    """
+
+    def __init__(self, reorder_window: int = 16) -> None:
+        self.reorder_window = reorder_window
+        self._stats: Dict[Any, Dict[str, Any]] = {}
+        # :meth:`observe` runs on the MQTT thread while the UI and snapshots read
+        self._lock = threading.Lock()
+
+    def observe(self, device: Any, seq: int, session: Optional[str] = None) -> str:
+        with self._lock:
+            return self._observe(device, seq, session)
+
+    def _observe(self, device: Any, seq: int, session: Optional[str]) -> str:
+        stats = self._stats.get(device)
+        if stats is None:
+            self._stats[device] = {
+                "received": 1,
+                "last_seq": seq,
+                "session": session,
+                "gaps": 0,
+                "missing": 0,
+                "duplicates": 0,
+                "resets": 0,
+            }
+            return OK
+        last = stats["last_seq"]
+        if last is None:
+            stats["session"] = session
+            status = OK
+        elif session != stats["session"]:
+            stats["session"] = session
+            stats["resets"] += 1
+            status = RESET
+        elif seq == last + 1:
+            status = OK
+        elif seq > last:
+            stats["gaps"] += 1
+            stats["missing"] += seq - last - 1
+            status = GAP
+        elif (seq == 0 and last != 0) or last - seq > self.reorder_window:
+            stats["resets"] += 1
+            status = RESET
+        else:
+            stats["duplicates"] += 1
+            return DUPLICATE
+        stats["received"] += 1
+        stats["last_seq"] = seq
+        return status
+
+    def stats(self) -> Dict[Any, Dict[str, Any]]:
+        with self._lock:
+            return {device: dict(stats) for device, stats in self._stats.items()}
+
+    def restore(self, stats: Dict[Any, Dict[str, Any]]) -> None:
+        """Continue from previously saved :meth:`stats`, e.g. after a restart.
+
+        Counters missing from older snapshots start at 0. Malformed stats
+        raise :class:`TypeError` or :class:`ValueError` before anything is
+        restored.
+        """
+
+        restored: Dict[Any, Dict[str, Any]] = {}
+        for device, device_stats in stats.items():
+            entry = restored[device] = dict(device_stats)
+            for name in _COUNTERS:
+                entry[name] = int(entry.get(name, 0))
+            last_seq = entry.get("last_seq")
+            if entry.get("session") is None or last_seq is None:
+                # Without a session, an old seq cannot be told from a restarted gateway's
+                entry["last_seq"] = None
+                entry["session"] = None
+            else:
+                entry["last_seq"] = int(last_seq)
+        with self._lock:
+            self._stats.update(restored)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
@@ -0,0 +1,278 @@
+"""Binary snapshots of the dashboard buffers for warm restarts.
+
+A snapshot file is laid out as::
+
+    magic (8 bytes) | header length (uint32) | JSON header | padding | rows
+
+The JSON header holds the small state: the latest-value index, sequence
+statistics, a table of the distinct ``(device, sensor, topic, session)`` keys and
+any message that does not fit the row layout (text values, aggregate
+windows, extra fields). The rows are a fixed-width little-endian record array
+aligned to 8 bytes, one per buffered message, so loading memory-maps the file
+and reads each column in one go instead of parsing message by message.
+
+Files are written to a uniquely named temporary file and renamed into place,
+so a crash while saving leaves the previous snapshot intact and concurrent
+writers never share a temporary file.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"IOTSNAP\x01"
+_PREFIX = struct.Struct("<8sI")
+
+ROW_DTYPE = np.dtype(
+    [
+        ("received_at", "<f8"),
+        ("timestamp", "<f8"),
+        ("value", "<f8"),
+        ("seq", "<i8"),
+        ("key", "<u4"),
+        ("flags", "<u4"),
+    ]
+)
+
+HAS_TIMESTAMP = 0x01
+HAS_SEQ = 0x02
+INT_VALUE = 0x04
+EXTRA = 0x08
+HAS_SESSION = 0x10
+
+_ROW_FIELDS = frozenset(("device", "sensor", "value", "timestamp", "seq", "session", "topic"))
+_MAX_EXACT_INT = 2**53
+
+
+def _is_int(value: Any) -> bool:
+    return type(value) is int
+
+
+class Snapshot:
+    """Contents of a snapshot file."""
+
+    def __init__(
+        self,
+        entries: List[Tuple[float, Dict[str, Any]]],
+        latest: List[Dict[str, Any]],
+        sequences: Dict[Any, Dict[str, Any]],
+        created: float,
+    ) -> None:
+        self.entries = entries
+        self.latest = latest
+        self.sequences = sequences
+        self.created = created
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def _encode_row(record: Dict[str, Any], keys: Dict[Tuple[Any, ...], int]) -> Optional[Tuple]:
+    """Row fields for ``record``, or ``None`` if it must be kept in the header."""
+
+    if not record.keys() <= _ROW_FIELDS or not {"device", "sensor", "value", "topic"} <= record.keys():
+        return None
+    value = record["value"]
+    flags = 0
+    if _is_int(value) and abs(value) < _MAX_EXACT_INT:
+        flags |= INT_VALUE
+    elif type(value) is not float:
+        return None
+    timestamp = record.get("timestamp")
+    if timestamp is not None:
+        if type(timestamp) is not float:
+            return None
+        flags |= HAS_TIMESTAMP
+    seq = record.get("seq")
+    if seq is not None:
+        if not _is_int(seq) or abs(seq) >= 2**63:
+            return None
+        flags |= HAS_SEQ
+    session = record.get("session")
+    if session is not None:
+        if type(session) is not str:
+            return None
+        flags |= HAS_SESSION
+    row_key = (record["device"], record["sensor"], record["topic"], session)
+    try:
+        key = keys.setdefault(row_key, len(keys))
+    except TypeError:  # unhashable device or sensor
+        return None
+    return timestamp or 0.0, float(value), seq or 0, key, flags
+
+
+def save_snapshot(
+    path: str | os.PathLike,
+    entries: List[Tuple[float, Dict[str, Any]]],
+    latest: List[Dict[str, Any]],
+    sequences: Dict[Any, Dict[str, Any]],
+) -> Path:
+    """Write ``(received_at, record)`` entries plus rollups to ``path``."""
+
+    keys: Dict[Tuple[Any, ...], int] = {}
+    rows = np.zeros(len(entries), dtype=ROW_DTYPE)
+    extras: Dict[str, Dict[str, Any]] = {}
+    columns: List[Tuple] = []
+    for index, (received_at, record) in enumerate(entries):
+        row = _encode_row(record, keys)
+        if row is None:
+            extras[str(index)] = record
+            row = (0.0, 0.0, 0, 0, EXTRA)
+        columns.append((received_at,) + row)
+    if columns:
+        rows[:] = columns
+
+    header = json.dumps(
+        {
+            "created": time.time(),
+            "count": len(entries),
+            "keys": [list(row_key) for row_key in keys],
+            "extras": extras,
+            "latest": latest,
+            "sequences": [[device, stats] for device, stats in sequences.items()],
+        },
+        separators=(",", ":"),
+        default=str,
+    ).encode("utf-8")
+    padding = -(_PREFIX.size + len(header)) % 8
+
+    output_path = Path(path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    handle = tempfile.NamedTemporaryFile(
+        dir=output_path.parent, prefix=output_path.name + ".", suffix=".tmp", delete=False
+    )
+    try:
+        with handle:
+            handle.write(_PREFIX.pack(MAGIC, len(header)))
+            handle.write(header)
+            handle.write(b"\0" * padding)
+            handle.write(rows.tobytes())
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(handle.name, output_path)
+    except BaseException:
+        os.unlink(handle.name)
+        raise
+    return output_path
+
+
+def _read_header(mapped: mmap.mmap, path: Any) -> Tuple[Dict[str, Any], int, int]:
+    """Parse the header; returns it with the row count and row offset."""
+
+    size = len(mapped)
+    magic, header_length = _PREFIX.unpack_from(mapped, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a dashboard snapshot")
+    header_end = _PREFIX.size + header_length
+    if header_end > size:
+        raise ValueError(f"Snapshot {path} is truncated")
+    header = json.loads(bytes(mapped[_PREFIX.size:header_end]))
+    count = int(header["count"])
+    offset = header_end + (-header_end % 8)
+    if offset + count * ROW_DTYPE.itemsize > size:
+        raise ValueError(f"Snapshot {path} is truncated")
+    return header, count, offset
+
+
+def _open_mapped(path: Any) -> Optional[Tuple[Any, mmap.mmap]]:
+    try:
+        handle = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    if os.fstat(handle.fileno()).st_size < _PREFIX.size:
+        handle.close()
+        raise ValueError(f"Snapshot {path} is truncated")
+    return handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _iter_rows(
+    mapped: mmap.mmap, header: Dict[str, Any], count: int, offset: int, chunk_rows: int
+) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    # Snapshots written before sessions were recorded have three-part keys
+    keys = [tuple(row_key) + (None,) * (4 - len(row_key)) for row_key in header["keys"]]
+    extras = header["extras"]
+    for chunk_start in range(0, count, chunk_rows):
+        rows = np.frombuffer(
+            mapped,
+            dtype=ROW_DTYPE,
+            count=min(chunk_rows, count - chunk_start),
+            offset=offset + chunk_start * ROW_DTYPE.itemsize,
+        )
+        # ``tolist`` copies the columns out so the mapping can be closed
+        columns = [rows[name].tolist() for name in ROW_DTYPE.names]
+        del rows
+        for index, (received_at, timestamp, value, seq, key, flags) in enumerate(
+            zip(*columns), chunk_start
+        ):
+            if flags & EXTRA:
+                yield received_at, extras[str(index)]
+                continue
+            device, sensor, topic, session = keys[key]
+            record: Dict[str, Any] = {
+                "device": device,
+                "sensor": sensor,
+                "value": int(value) if flags & INT_VALUE else value,
+            }
+            if flags & HAS_TIMESTAMP:
+                record["timestamp"] = timestamp
+            if flags & HAS_SEQ:
+                record["seq"] = seq
+            if flags & HAS_SESSION:
+                record["session"] = session
+            record["topic"] = topic
+            yield received_at, record
+
+
+def load_snapshot(path: str | os.PathLike) -> Optional[Snapshot]:
+    """Read a snapshot written by :func:`save_snapshot`.
+
+    Returns ``None`` if the file does not exist. Raises :class:`ValueError`
+    if it is not a valid snapshot.
+    """
+
+    opened = _open_mapped(path)
+    if opened is None:
+        return None
+    handle, mapped = opened
+    with handle, mapped:
+        header, count, offset = _read_header(mapped, path)
+        entries = list(_iter_rows(mapped, header, count, offset, chunk_rows=max(count, 1)))
+    return Snapshot(
+        entries=entries,
+        latest=header["latest"],
+        sequences={device: stats for device, stats in header["sequences"]},
+        created=float(header["created"]),
+    )
+
+
+def iter_snapshot(
+    path: str | os.PathLike, chunk_rows: int = 4096
+) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """Yield ``(received_at, record)`` from a snapshot without loading it whole.
+
+    Rows are decoded ``chunk_rows`` at a time straight from the mapping.
+    Raises :class:`FileNotFoundError` if the file does not exist.
+    """
+
+    opened = _open_mapped(path)
+    if opened is None:
+        raise FileNotFoundError(path)
+    handle, mapped = opened
+    with handle, mapped:
+        header, count, offset = _read_header(mapped, path)
+        yield from _iter_rows(mapped, header, count, offset, chunk_rows)
+
+
+__all__ = ["Snapshot", "save_snapshot", "load_snapshot", "iter_snapshot"]
@@ -0,0 +1,152 @@
+"""Trie index of MQTT topic filters for fast wildcard matching."""
+
+from __future__ import annotations
+
+import threading
+from typing import Dict, Iterator, List, Optional
+
+
+class _Node:
+    __slots__ = ("children", "filter")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        # Set when a filter terminates at this node
+        self.filter: Optional[str] = None
+
+
+def validate_filter(topic_filter: str) -> None:
+    """Raise :class:`ValueError` if ``topic_filter`` is not a valid MQTT filter."""
+
+    if not topic_filter:
+        raise ValueError("Topic filter must not be empty")
+    levels = topic_filter.split("/")
+    for position, level in enumerate(levels):
+        if "#" in level and (level != "#" or position != len(levels) - 1):
+            raise ValueError(f"'#' must be the last level of a topic filter: {topic_filter}")
+        if "+" in level and level != "+":
+            raise ValueError(f"'+' must occupy a whole topic level: {topic_filter}")
+
+
+class TopicTrie:
+    """Store MQTT subscription filters and match concrete topics against them.
+
+    Matching walks one trie level per topic level, so the cost depends on the
+    topic depth rather than on the number of filters. Results are memoised per
+    topic because a dashboard sees the same small set of topics over and over.
+
+    Filters may be added and removed from one thread while another matches
+    topics: a lock makes every call atomic, so a match never walks a
+    half-pruned branch or caches a result computed before a change.
+    """
+
+    def __init__(self, filters: Optional[List[str]] = None, cache_size: int = 4096) -> None:
+        self._root = _Node()
+        self._count = 0
+        self._cache: Dict[str, List[str]] = {}
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        for topic_filter in filters or []:
+            self.add(topic_filter)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, topic_filter: str) -> bool:
+        with self._lock:
+            node = self._find(topic_filter)
+            return node is not None and node.filter is not None
+
+    def __iter__(self) -> Iterator[str]:
+        filters: List[str] = []
+        with self._lock:
+            stack = [self._root]
+            while stack:
+                node = stack.pop()
+                if node.filter is not None:
+                    filters.append(node.filter)
+                stack.extend(node.children.values())
+        return iter(filters)
+
+    def add(self, topic_filter: str) -> None:
+        validate_filter(topic_filter)
+        with self._lock:
+            self._add(topic_filter)
+
+    def _add(self, topic_filter: str) -> None:
+        node = self._root
+        for level in topic_filter.split("/"):
+            node = node.children.setdefault(level, _Node())
+        if node.filter is None:
+            node.filter = topic_filter
+            self._count += 1
+            self._cache.clear()
+
+    def remove(self, topic_filter: str) -> bool:
+        with self._lock:
+            return self._remove(topic_filter)
+
+    def _remove(self, topic_filter: str) -> bool:
+        path = [self._root]
+        for level in topic_filter.split("/"):
+            child = path[-1].children.get(level)
+            if child is None:
+                return False
+            path.append(child)
+        if path[-1].filter is None:
+            return False
+        path[-1].filter = None
+        self._count -= 1
+        self._cache.clear()
+        # Prune branches that no longer lead to any filter
+        levels = topic_filter.split("/")
+        for depth in range(len(levels), 0, -1):
+            node = path[depth]
+            if node.children or node.filter is not None:
+                break
+            del path[depth - 1].children[levels[depth - 1]]
+        return True
+
+    def match(self, topic: str) -> List[str]:
+        """Return every stored filter that matches ``topic``."""
+
+        with self._lock:
+            cached = self._cache.get(topic)
+            if cached is not None:
+                return cached
+            levels = topic.split("/")
+            matches: List[str] = []
+            self._walk(self._root, levels, 0, matches)
+            if len(self._cache) >= self._cache_size:
+                self._cache.clear()
+            self._cache[topic] = matches
+            return matches
+
+    def matches(self, topic: str) -> bool:
+        return bool(self.match(topic))
+
+    def _walk(self, node: _Node, levels: List[str], depth: int, matches: List[str]) -> None:
+        # Wildcards never match topics starting with '$' at the first level
+        wildcard_ok = depth > 0 or not levels[0].startswith("$")
+        hash_node = node.children.get("#")
+        if hash_node is not None and wildcard_ok and hash_node.filter is not None:
+            # 'a/#' also matches the parent topic 'a'
+            matches.append(hash_node.filter)
+        if depth == len(levels):
+            if node.filter is not None:
+                matches.append(node.filter)
+            return
+        child = node.children.get(levels[depth])
+        if child is not None:
+            self._walk(child, levels, depth + 1, matches)
+        plus_node = node.children.get("+")
+        if plus_node is not None and wildcard_ok:
+            self._walk(plus_node, levels, depth + 1, matches)
+
+    def _find(self, topic_filter: str) -> Optional[_Node]:
+        node = self._root
+        for level in topic_filter.split("/"):
+            node = node.children.get(level)
+            if node is None:
+                return None
+        return node
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import Dict, List
+from typing import Any, Callable, Dict, List, Optional
 
 import pandas as pd
 import streamlit as st
@@ -31,34 +31,45 @@ def render_control_panel(capture_enabled: bool) -> Dict[str, bool]:
     return actions
 
 
-def render_command_sender(command_topic: str, broker: str, port: int) -> None:
+def render_buffer_usage(messages: int, memory_bytes: int) -> None:
+    st.caption(f"Buffered: {messages:,} messages · ~{memory_bytes / (1024 * 1024):.1f} MiB")
+
+
+def render_subscription_filter(current: List[str]) -> Optional[List[str]]:
+    """Edit the MQTT topic filters; returns the new list when it changed."""
+
+    with st.expander("Topic filters", expanded=False):
+        st.write(
+            "One MQTT filter per line, e.g. `lab/+/data/temperature` or `lab/device1/data/#`."
+        )
+        text = st.text_area("Subscriptions", value="\n".join(sorted(current)), key="topic_filters")
+    filters = [line.strip() for line in text.splitlines() if line.strip()]
+    if sorted(filters) == sorted(current):
+        return None
+    return filters
+
+
+def render_command_sender(command_topic: str, send: Callable[[str, str], bool]) -> None:
     with st.expander("Send command", expanded=False):
         st.write(
             "Send manual commands to the device via MQTT (e.g. `LED_ON`)."
         )
         command = st.text_input("Command", key="command_input")
         if st.button("Publish", key="command_button") and command:
-            import paho.mqtt.client as mqtt
+            if send(command_topic, command):
+                st.success(f"Sent `{command}` to `{command_topic}`")
+            else:
+                st.error("Not connected to the MQTT broker; command not sent.")
 
-            client = mqtt.Client()
-            client.connect(broker, port)
-            client.publish(command_topic, command)
-            client.disconnect()
-            st.success(f"Sent `{command}` to `{command_topic}`")
 
+def render_live_chart(chart_df: pd.DataFrame) -> None:
+    """Plot a time-indexed frame with one column per sensor."""
 
-def render_live_chart(df: pd.DataFrame) -> None:
     st.subheader("Live sensor chart")
-    if df.empty:
+    if chart_df.empty:
         st.info("Waiting for sensor data …")
         return
-    chart_df = df.copy()
-    chart_df["time"] = pd.to_datetime(chart_df["timestamp"], unit="s")
-    pivot = chart_df.pivot_table(
-        index="time", columns="sensor", values="value", aggfunc="last"
-    )
-    pivot = pivot.sort_index()
-    st.line_chart(pivot)
+    st.line_chart(chart_df)
 
 
 def render_message_log(messages: List[Dict[str, object]]) -> None:
@@ -67,20 +78,64 @@ def render_message_log(messages: List[Dict[str, object]]) -> None:
         st.info("No messages received yet.")
         return
     rows = [
-        f"{pd.to_datetime(msg.get('timestamp', 0), unit='s').strftime('%H:%M:%S')} | "
+        f"{pd.to_datetime(msg.get('timestamp', 0), unit='s').strftime('%H:%M:%S.%f')[:-3]} | "
         f"{msg.get('sensor', 'unknown')}: {msg.get('value')}"
         for msg in messages[::-1]
     ]
     st.code("\n".join(rows))
 
 
-def render_metrics(latest: List[Dict[str, object]]) -> None:
+def render_metrics(latest: List[Dict[str, object]], columns: int = 3) -> None:
+    """Show one tile per sensor from the latest-value index entries."""
+
     if not latest:
         return
-    cols = st.columns(min(3, len(latest)))
-    for col, msg in zip(cols, latest[::-1]):
-        with col:
-            st.metric(
-                label=f"{msg.get('sensor', 'sensor')} ({msg.get('device', 'device')})",
-                value=msg.get("value"),
-            )
+    for start in range(0, len(latest), columns):
+        row = latest[start : start + columns]
+        for col, entry in zip(st.columns(columns), row):
+            with col:
+                st.metric(
+                    label=f"{entry.get('sensor', 'sensor')} ({entry.get('device', 'device')})",
+                    value=entry.get("value"),
+                    help=f"{entry['rate']:.1f} msg/s, updated {entry['staleness']:.1f}s ago",
+                )
+
+
+def device_overview_toggle(sensors: int) -> bool:
+    """Switch for the device overview, so its table is only built while shown."""
+
+    if not sensors:
+        return False
+    return st.toggle(f"Device overview ({sensors} sensors)", key="device_overview")
+
+
+def render_device_overview(entries: List[Dict[str, object]], stale_after: float = 10.0) -> None:
+    """Table of the latest value, rate and staleness of every device/sensor."""
+
+    if not entries:
+        return
+    df = pd.DataFrame(entries)
+    df["rate"] = df["rate"].round(2)
+    df["staleness"] = df["staleness"].round(1)
+    df["stale"] = df["staleness"] > stale_after
+    st.dataframe(
+        df[["device", "sensor", "value", "rate", "staleness", "stale", "count"]],
+        use_container_width=True,
+        hide_index=True,
+    )
+
+
+def render_stream_health(stats: Dict[Any, Dict[str, Any]]) -> None:
+    """Show per-device sequence gaps, duplicates and gateway restarts."""
+
+    if not stats:
+        return
+    st.subheader("Stream health")
+    rows = [{"device": device, **values} for device, values in stats.items()]
+    df = pd.DataFrame(rows).set_index("device")
+    if df[["gaps", "duplicates"]].to_numpy().any():
+        st.warning(
+            f"{int(df['missing'].sum())} messages missing in {int(df['gaps'].sum())} gaps, "
+            f"{int(df['duplicates'].sum())} duplicates dropped"
+        )
+    st.dataframe(df, use_container_width=True)
@@ -0,0 +1,182 @@
+"""Streaming window aggregation for high-rate sensor readings."""
+
+from __future__ import annotations
+
+import math
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+
+class _Stats:
+    """Running count/min/max/mean/variance using Welford's algorithm."""
+
+    __slots__ = ("count", "minimum", "maximum", "mean", "m2")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other: "_Stats") -> None:
+        if not other.count:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.m2 / self.count) if self.count else 0.0
+
+
+class _SensorWindows:
+    """Pane state for one sensor; a window is the last ``panes_per_window`` panes."""
+
+    __slots__ = ("panes", "next_end")
+
+    def __init__(self, first_pane: int) -> None:
+        self.panes: Deque[Tuple[int, _Stats]] = deque()
+        # Index of the pane boundary at which the next window closes
+        self.next_end = first_pane + 1
+
+
+class WindowAggregator:
+    """Summarise numeric readings per sensor over tumbling or hopping windows.
+
+    Time is split into panes of ``hop`` seconds aligned to the epoch. Each pane
+    keeps O(1) running statistics, so a sensor holds at most
+    ``window / hop`` panes no matter how fast it is sampled. With ``hop`` unset
+    the windows are tumbling (one pane per window); otherwise a window of
+    ``window`` seconds closes every ``hop`` seconds.
+    """
+
+    def __init__(
+        self,
+        window: float,
+        hop: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        if window <= 0:
+            raise ValueError("Aggregation window must be positive")
+        if hop is None:
+            hop = window
+        if hop <= 0 or hop > window:
+            raise ValueError("Aggregation hop must be within (0, window]")
+        panes = window / hop
+        if abs(panes - round(panes)) > 1e-9:
+            raise ValueError("Aggregation window must be a multiple of hop")
+        self.window = float(window)
+        self.hop = float(hop)
+        self.panes_per_window = int(round(panes))
+        self.clock = clock
+        self._sensors: Dict[Hashable, _SensorWindows] = {}
+
+    def __len__(self) -> int:
+        return len(self._sensors)
+
+    def add(self, payload: Dict[str, Any], now: Optional[float] = None) -> bool:
+        """Feed a parsed payload; returns ``False`` if its value is not numeric."""
+
+        value = payload.get("value")
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        now = self.clock() if now is None else now
+        pane = math.floor(now / self.hop)
+        key = (payload.get("device"), payload.get("sensor"))
+        state = self._sensors.get(key)
+        if state is None:
+            state = self._sensors[key] = _SensorWindows(pane)
+        if state.panes and state.panes[-1][0] == pane:
+            stats = state.panes[-1][1]
+        else:
+            stats = _Stats()
+            state.panes.append((pane, stats))
+        stats.add(float(value))
+        return True
+
+    def collect(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Close every window that ended at or before ``now`` and return summaries.
+
+        Call this regularly (the gateway does so on each loop iteration) so that
+        windows close on time even when a sensor stops sending.
+        """
+
+        now = self.clock() if now is None else now
+        current = math.floor(now / self.hop)
+        summaries: List[Dict[str, Any]] = []
+        for key in list(self._sensors):
+            state = self._sensors[key]
+            while state.panes:
+                self._skip_empty(state)
+                if state.next_end > current:
+                    break
+                summary = self._close(key, state)
+                if summary:
+                    summaries.append(summary)
+            if not state.panes:
+                del self._sensors[key]
+        return summaries
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """Close every window that still holds data, e.g. on shutdown."""
+
+        summaries: List[Dict[str, Any]] = []
+        for key, state in self._sensors.items():
+            while state.panes:
+                self._skip_empty(state)
+                summary = self._close(key, state)
+                if summary:
+                    summaries.append(summary)
+        self._sensors.clear()
+        return summaries
+
+    @staticmethod
+    def _skip_empty(state: _SensorWindows) -> None:
+        # Windows ending at or before the oldest pane hold no data; jump past them
+        state.next_end = max(state.next_end, state.panes[0][0] + 1)
+
+    def _close(self, key: Tuple[Any, Any], state: _SensorWindows) -> Optional[Dict[str, Any]]:
+        end = state.next_end
+        start = end - self.panes_per_window
+        state.next_end += 1
+        combined = _Stats()
+        for pane, stats in state.panes:
+            if start <= pane < end:
+                combined.merge(stats)
+        # Panes that cannot take part in any later window are dropped
+        while state.panes and state.panes[0][0] <= state.next_end - 1 - self.panes_per_window:
+            state.panes.popleft()
+        if not combined.count:
+            return None
+        device, sensor = key
+        window_end = end * self.hop
+        return {
+            "device": device,
+            "sensor": sensor,
+            "value": combined.mean,
+            "count": combined.count,
+            "min": combined.minimum,
+            "max": combined.maximum,
+            "mean": combined.mean,
+            "stddev": combined.stddev,
+            "window_start": start * self.hop,
+            "window_end": window_end,
+            "timestamp": window_end,
+        }
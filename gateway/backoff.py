@@ -0,0 +1,40 @@
+"""Exponential backoff with jitter for reconnection loops."""
+
+from __future__ import annotations
+
+import random
+from typing import Callable
+
+
+class Backoff:
+    """Produce retry delays that double up to ``maximum``, with jitter.
+
+    Each delay is drawn uniformly from the upper half of the current step
+    ("equal jitter"), so reconnecting clients spread out instead of retrying
+    in lockstep while still waiting at least half the nominal delay.
+    """
+
+    def __init__(
+        self,
+        initial: float = 0.5,
+        maximum: float = 30.0,
+        multiplier: float = 2.0,
+        jitter: bool = True,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        self.initial = min(initial, maximum)
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.rng = rng
+        self.attempts = 0
+
+    def next_delay(self) -> float:
+        step = min(self.maximum, self.initial * self.multiplier ** self.attempts)
+        self.attempts += 1
+        if not self.jitter:
+            return step
+        return step / 2 + self.rng() * step / 2
+
+    def reset(self) -> None:
+        self.attempts = 0
@@ -0,0 +1,179 @@
+"""Command queueing and acknowledgement tracking for the serial write path."""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+_KEY_SPLIT = re.compile(r"[=:\s]")
+
+
+def command_key(text: str) -> str:
+    """Return the part of a command that identifies what it controls.
+
+    ``LED=1`` and ``LED=0`` share the key ``LED``, so with coalescing enabled
+    the later one supersedes the earlier if both are still waiting.
+    """
+
+    return _KEY_SPLIT.split(text.strip(), 1)[0]
+
+
+class PendingCommand:
+    """A command received from MQTT and waiting to be written or acknowledged."""
+
+    __slots__ = ("text", "key", "received_at", "written_at")
+
+    def __init__(self, text: str, received_at: float) -> None:
+        self.text = text
+        self.key = command_key(text)
+        self.received_at = received_at
+        self.written_at: Optional[float] = None
+
+    def __repr__(self) -> str:
+        return f"PendingCommand({self.text!r})"
+
+
+class CommandQueue:
+    """Thread-safe FIFO of commands for the gateway loop to write to serial.
+
+    :meth:`put` is called from the MQTT network thread and wakes the gateway
+    loop, which blocks in :meth:`wait` instead of sleeping so that a new
+    command is written without waiting out the read interval.
+    """
+
+    def __init__(
+        self,
+        coalesce: bool = False,
+        maxsize: int = 100,
+        clock: Callable[[], float] = time.monotonic,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        self.coalesce = coalesce
+        self.maxsize = maxsize
+        self.clock = clock
+        self.logger = logger or logging.getLogger(self.__class__.__name__)
+        self._pending: "OrderedDict[Hashable, PendingCommand]" = OrderedDict()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def put(self, text: str) -> None:
+        text = text.strip()
+        if not text:
+            return
+        command = PendingCommand(text, self.clock())
+        with self._lock:
+            if self.coalesce and command.key in self._pending:
+                superseded = self._pending[command.key]
+                self.logger.debug("Command %r superseded by %r", superseded.text, text)
+                self._pending[command.key] = command
+            else:
+                if len(self._pending) >= self.maxsize:
+                    _, dropped = self._pending.popitem(last=False)
+                    self.logger.warning("Command queue full; dropping %r", dropped.text)
+                key = command.key if self.coalesce else next(self._ids)
+                self._pending[key] = command
+            self._ready.set()
+
+    def pop(self) -> Optional[PendingCommand]:
+        with self._lock:
+            if not self._pending:
+                self._ready.clear()
+                return None
+            _, command = self._pending.popitem(last=False)
+            if not self._pending:
+                self._ready.clear()
+            return command
+
+    def wait(self, timeout: float) -> bool:
+        """Block for up to ``timeout`` seconds; returns early when a command arrives."""
+
+        return self._ready.wait(timeout)
+
+
+class AckTracker:
+    """Match device acknowledgements to written commands and record latency.
+
+    The device acknowledges with a line starting with ``prefix``, optionally
+    followed by the command text or key (``ACK:LED=1``, ``ACK LED``). A bare
+    ``ACK`` acknowledges the oldest outstanding command. Latency is measured
+    from MQTT receipt to the acknowledgement.
+    """
+
+    def __init__(
+        self,
+        prefix: str = "ACK",
+        timeout: float = 5.0,
+        history: int = 100,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.prefix = prefix
+        self.timeout = timeout
+        self.clock = clock
+        self.timeouts = 0
+        self._in_flight: Deque[PendingCommand] = deque()
+        self._latencies: Deque[float] = deque(maxlen=history)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    def is_ack(self, line: str) -> bool:
+        return line.startswith(self.prefix)
+
+    def sent(self, command: PendingCommand) -> None:
+        command.written_at = self.clock()
+        self._in_flight.append(command)
+
+    def match(self, line: str) -> Optional[Tuple[PendingCommand, float]]:
+        """Resolve an acknowledgement line; returns the command and its latency."""
+
+        body = line[len(self.prefix):].lstrip(":= ").strip()
+        command = None
+        if not body:
+            command = self._in_flight[0] if self._in_flight else None
+        else:
+            key = command_key(body)
+            command = next((c for c in self._in_flight if c.text == body), None) or next(
+                (c for c in self._in_flight if c.key == key), None
+            )
+        if command is None:
+            return None
+        self._in_flight.remove(command)
+        latency = self.clock() - command.received_at
+        self._latencies.append(latency)
+        self._count += 1
+        return command, latency
+
+    def expire(self) -> List[PendingCommand]:
+        """Drop and return commands that were not acknowledged in time."""
+
+        expired: List[PendingCommand] = []
+        deadline = self.clock() - self.timeout
+        while self._in_flight and (self._in_flight[0].written_at or 0.0) < deadline:
+            expired.append(self._in_flight.popleft())
+        self.timeouts += len(expired)
+        return expired
+
+    def latency_stats(self) -> Dict[str, float]:
+        """Round-trip statistics in milliseconds over the recent history."""
+
+        if not self._latencies:
+            return {"count": self._count, "timeouts": self.timeouts}
+        ordered = sorted(self._latencies)
+        return {
+            "count": self._count,
+            "timeouts": self.timeouts,
+            "last_ms": self._latencies[-1] * 1000,
+            "mean_ms": sum(ordered) / len(ordered) * 1000,
+            "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+            "max_ms": ordered[-1] * 1000,
+        }
@@ -5,11 +5,16 @@ from __future__ import annotations
 import logging
 import signal
 import time
-from typing import Optional, TYPE_CHECKING
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
 
-from iot_lab import configure_logging, load_config
+from iot_lab import PayloadCodec, configure_logging, load_config
+from iot_lab.log_pipeline import PER_MESSAGE
 
+from .aggregator import WindowAggregator
+from .commands import AckTracker, CommandQueue
 from .message_parser import MessageParser
+from .rules import RuleEngine
+from .sequencing import SequenceStamper
 from .serial_reader import SerialReader
 
 if TYPE_CHECKING:  # pragma: no cover - type hints only
@@ -17,6 +22,8 @@ if TYPE_CHECKING:  # pragma: no cover - type hints only
 
 LOGGER = logging.getLogger("gateway")
 
+_TOPIC_LEVEL_TABLE = str.maketrans({"/": "_", "+": "_", "#": "_", "\0": "_"})
+
 
 class GatewayController:
     """Coordinate serial reading, message parsing and MQTT publishing."""
@@ -28,12 +35,33 @@ class GatewayController:
         parser: MessageParser,
         publish_topic: str,
         read_interval: float = 0.1,
+        aggregator: Optional[WindowAggregator] = None,
+        raw_topic: Optional[str] = None,
+        per_sensor_topics: bool = False,
+        commands: Optional[CommandQueue] = None,
+        acks: Optional[AckTracker] = None,
+        codec: Optional[PayloadCodec] = None,
+        rules: Optional[RuleEngine] = None,
+        alert_topic: Optional[str] = None,
+        ack_topic: Optional[str] = None,
+        sequencer: Optional[SequenceStamper] = None,
     ) -> None:
         self.serial_reader = serial_reader
         self.mqtt_client = mqtt_client
         self.parser = parser
         self.publish_topic = publish_topic
         self.read_interval = read_interval
+        self.aggregator = aggregator
+        self.raw_topic = raw_topic
+        self.per_sensor_topics = per_sensor_topics
+        self._topics: Dict[Tuple[str, Any], str] = {}
+        self.commands = commands
+        self.acks = acks
+        self.codec = codec or PayloadCodec()
+        self.rules = rules
+        self.alert_topic = alert_topic or f"{publish_topic.rsplit('/', 1)[0]}/alerts"
+        self.ack_topic = ack_topic
+        self.sequencer = sequencer or SequenceStamper()
         self._running = False
 
     def start(self) -> None:
@@ -41,23 +69,142 @@ class GatewayController:
         self._running = True
         self.mqtt_client.connect()
         while self._running:
+            self.service_commands()
             raw = self.serial_reader.read_line()
             if raw:
                 self.handle_line(raw)
-            time.sleep(self.read_interval)
+            self.flush_windows()
+            if not raw:
+                # Only pause when the port is idle so high-rate streams are drained
+                self._idle(self.read_interval)
+
+    def _idle(self, timeout: float) -> None:
+        if self.commands is None:
+            time.sleep(timeout)
+        else:
+            # Wakes as soon as a command is queued instead of sleeping it out
+            self.commands.wait(timeout)
+
+    def service_commands(self) -> int:
+        """Write queued commands to the serial port; returns how many were sent."""
+
+        if self.commands is None:
+            return 0
+        sent = 0
+        while True:
+            command = self.commands.pop()
+            if command is None:
+                break
+            if not self.serial_reader.write(command.text):
+                LOGGER.warning("Dropping command %r after serial write failure", command.text)
+                self.report_command(command.text, "failed")
+                continue
+            sent += 1
+            if self.acks is not None:
+                self.acks.sent(command)
+        if self.acks is not None:
+            for expired in self.acks.expire():
+                LOGGER.warning("Command %r was not acknowledged by the device", expired.text)
+                self.report_command(expired.text, "timeout")
+        return sent
+
+    def handle_ack(self, raw: str) -> None:
+        matched = self.acks.match(raw) if self.acks is not None else None
+        if matched is None:
+            LOGGER.warning("Unexpected acknowledgement from device: %s", raw)
+            return
+        command, latency = matched
+        LOGGER.info("Command %r acknowledged after %.1f ms", command.text, latency * 1000)
+        self.report_command(command.text, "ack", reply=raw, latency_ms=round(latency * 1000, 3))
+
+    def report_command(self, text: str, status: str, **details: Any) -> None:
+        """Publish the outcome of a command on the control lane, if ``ack_topic`` is set."""
 
-    def handle_line(self, raw: str) -> Optional[str]:
+        if not self.ack_topic:
+            return
+        report = {"command": text, "status": status, "timestamp": time.time(), **details}
+        self.mqtt_client.publish(self.ack_topic, self.codec.encode(report), lane="control")
+
+    def handle_line(self, raw: str) -> Optional[bytes]:
+        """Process one serial line; returns the payload published to ``publish_topic``.
+
+        Returns ``None`` when nothing was published there: for acks, empty
+        lines and readings that went into an aggregation window.
+        """
+
+        if self.acks is not None and self.acks.is_ack(raw):
+            self.handle_ack(raw)
+            return None
         payload_dict = self.parser.parse(raw)
         if not payload_dict:
-            LOGGER.debug("Ignoring empty serial payload")
+            LOGGER.debug("Ignoring empty serial payload", extra=PER_MESSAGE)
             return None
-        payload = self.parser.to_json(payload_dict)
-        self.mqtt_client.publish(self.publish_topic, payload)
+        if self.rules is not None:
+            self.publish_alerts(self.rules.evaluate(payload_dict))
+        if self.aggregator is None:
+            return self.publish_data(payload_dict)
+        if self.raw_topic:
+            # Raw copies go to a separate stream and are not numbered
+            raw_topic = self.topic_for(self.raw_topic, payload_dict.get("sensor"))
+            self.mqtt_client.publish(raw_topic, self.codec.encode(payload_dict))
+        if not self.aggregator.add(payload_dict):
+            # Non-numeric readings cannot be summarised; forward them unchanged
+            return self.publish_data(payload_dict)
+        return None
+
+    def publish_data(self, payload_dict: Dict[str, Any]) -> bytes:
+        """Number a reading or summary and publish it to ``publish_topic``."""
+
+        topic = self.topic_for(self.publish_topic, payload_dict.get("sensor"))
+        payload = self.codec.encode(self.sequencer.stamp(payload_dict))
+        self.mqtt_client.publish(topic, payload)
         return payload
 
+    def publish_alerts(self, alerts: List[Dict[str, Any]]) -> None:
+        """Publish alerts on the alerts lane, ahead of the reading that raised them."""
+
+        for alert in alerts:
+            if alert["state"] == "active":
+                LOGGER.warning(
+                    "Alert %s on %s/%s: %s %s %s",
+                    alert["rule"],
+                    alert["device"],
+                    alert["sensor"],
+                    alert["signal"],
+                    alert["condition"],
+                    alert["limit"],
+                )
+            else:
+                LOGGER.info("Alert %s on %s/%s cleared", alert["rule"], alert["device"], alert["sensor"])
+            self.mqtt_client.publish(self.alert_topic, self.codec.encode(alert), lane="alerts")
+
+    def topic_for(self, base: str, sensor: Any) -> str:
+        """Return the topic for ``sensor``, i.e. ``<base>/<sensor>`` when fanning out."""
+
+        if not self.per_sensor_topics or sensor is None:
+            return base
+        key = (base, sensor)
+        topic = self._topics.get(key)
+        if topic is None:
+            # Wildcard characters and separators are not allowed inside one level
+            level = str(sensor).translate(_TOPIC_LEVEL_TABLE) or "_"
+            topic = self._topics[key] = f"{base}/{level}"
+        return topic
+
+    def flush_windows(self, final: bool = False) -> int:
+        """Publish a summary for every aggregation window that has closed."""
+
+        if self.aggregator is None:
+            return 0
+        summaries = self.aggregator.flush() if final else self.aggregator.collect()
+        for summary in summaries:
+            self.publish_data(summary)
+        return len(summaries)
+
     def stop(self) -> None:
         LOGGER.info("Stopping gateway controller")
         self._running = False
+        self.flush_windows(final=True)
         self.serial_reader.close()
         self.mqtt_client.stop()
 
@@ -73,16 +220,62 @@ def create_controller_from_config(config) -> GatewayController:
         port=serial_cfg.get("port", "/dev/ttyUSB0"),
         baudrate=int(serial_cfg.get("baudrate", 115200)),
         reconnect_interval=float(serial_cfg.get("reconnect_interval", 5)),
+        timeout=float(serial_cfg.get("timeout", 1.0)),
+    )
+    parser = MessageParser(
+        device_id=gateway_cfg.get("device_id", "device"),
+        device_time_key=gateway_cfg.get("device_time_key"),
+        device_time_scale=float(gateway_cfg.get("device_time_scale", 1.0)),
+    )
+
+    command_cfg = gateway_cfg.get("commands") or {}
+    commands = CommandQueue(
+        coalesce=bool(command_cfg.get("coalesce", False)),
+        maxsize=int(command_cfg.get("max_pending", 100)),
+    )
+    ack_prefix = command_cfg.get("ack_prefix")
+    acks = (
+        AckTracker(prefix=str(ack_prefix), timeout=float(command_cfg.get("ack_timeout", 5.0)))
+        if ack_prefix
+        else None
     )
-    parser = MessageParser(device_id=gateway_cfg.get("device_id", "device"))
     mqtt_client = MQTTClient(
         host=mqtt_cfg.get("host", "localhost"),
         port=int(mqtt_cfg.get("port", 1883)),
         command_topic=mqtt_cfg.get("command_topic"),
+        on_command=commands.put,
+        reconnect_interval=float(mqtt_cfg.get("reconnect_interval", 5)),
+        max_pending=int(mqtt_cfg.get("max_pending", 10000)),
+        lanes=mqtt_cfg.get("lanes") or None,
     )
     publish_topic = mqtt_cfg.get("publish_topic", "lab/device1/data")
     read_interval = float(gateway_cfg.get("read_interval", 0.1))
-    return GatewayController(serial_reader, mqtt_client, parser, publish_topic, read_interval)
+
+    rules_cfg = gateway_cfg.get("rules") or []
+    aggregation_cfg = gateway_cfg.get("aggregation") or {}
+    aggregator = None
+    if aggregation_cfg.get("enabled", False):
+        hop = aggregation_cfg.get("hop")
+        aggregator = WindowAggregator(
+            window=float(aggregation_cfg.get("window", 1.0)),
+            hop=float(hop) if hop is not None else None,
+        )
+    return GatewayController(
+        serial_reader,
+        mqtt_client,
+        parser,
+        publish_topic,
+        read_interval,
+        aggregator=aggregator,
+        raw_topic=aggregation_cfg.get("raw_topic") if aggregator else None,
+        per_sensor_topics=bool(mqtt_cfg.get("per_sensor_topics", False)),
+        commands=commands,
+        acks=acks,
+        codec=PayloadCodec.from_config(mqtt_cfg),
+        rules=RuleEngine.from_config(rules_cfg) if rules_cfg else None,
+        alert_topic=mqtt_cfg.get("alert_topic"),
+        ack_topic=mqtt_cfg.get("ack_topic"),
+    )
 
 
 def run_gateway() -> None:
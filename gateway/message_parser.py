@@ -4,8 +4,11 @@ from __future__ import annotations
 
 import json
 import logging
-import time
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional
+
+from iot_lab.log_pipeline import PER_MESSAGE
+
+from .timing import AnchoredClock, ClockOffsetEstimator
 
 
 def _coerce_value(value: str) -> Any:
@@ -18,12 +21,44 @@ def _coerce_value(value: str) -> Any:
 
 
 class MessageParser:
-    """Parse serial strings into JSON-serialisable dictionaries."""
+    """Parse serial strings into JSON-serialisable dictionaries.
+
+    Every payload is stamped with a float ``timestamp`` (microsecond precision,
+    from a monotonic-anchored clock). ``seq`` belongs to the gateway (see
+    :class:`~gateway.sequencing.SequenceStamper`), so a ``seq`` sent by the
+    device is kept as ``device_seq``. If ``device_time_key`` is set, JSON payloads carrying that key are
+    timestamped from the device clock (multiplied by ``device_time_scale`` to
+    get seconds) corrected by the estimated device-to-host clock offset.
+    """
 
-    def __init__(self, device_id: str, default_sensor: str = "sensor", logger=None) -> None:
+    def __init__(
+        self,
+        device_id: str,
+        default_sensor: str = "sensor",
+        logger=None,
+        clock: Optional[Callable[[], float]] = None,
+        device_time_key: Optional[str] = None,
+        device_time_scale: float = 1.0,
+    ) -> None:
         self.device_id = device_id
         self.default_sensor = default_sensor
         self.logger = logger or logging.getLogger(self.__class__.__name__)
+        self.clock = clock or AnchoredClock()
+        self.device_time_key = device_time_key
+        self.device_time_scale = device_time_scale
+        self._offsets: Dict[Any, ClockOffsetEstimator] = {}
+
+    def _device_timestamp(self, payload: Dict[str, Any], host_time: float) -> Optional[float]:
+        raw = payload.get(self.device_time_key) if self.device_time_key else None
+        if isinstance(raw, str):
+            raw = _coerce_value(raw)
+        if isinstance(raw, bool) or not isinstance(raw, (int, float)):
+            return None
+        device_time = raw * self.device_time_scale
+        estimator = self._offsets.get(payload["device"])
+        if estimator is None:
+            estimator = self._offsets[payload["device"]] = ClockOffsetEstimator()
+        return device_time + estimator.update(host_time, device_time)
 
     def parse(self, raw: str) -> Optional[Dict[str, Any]]:
         if not raw:
@@ -32,13 +67,19 @@ class MessageParser:
         if not raw:
             return None
 
-        timestamp = int(time.time())
+        timestamp = round(self.clock(), 6)
         try:
             payload = json.loads(raw)
             if not isinstance(payload, dict):
                 raise ValueError("JSON payload must be an object")
             payload.setdefault("device", self.device_id)
-            payload.setdefault("timestamp", timestamp)
+            device_timestamp = self._device_timestamp(payload, timestamp)
+            if device_timestamp is not None:
+                payload["timestamp"] = round(device_timestamp, 6)
+            else:
+                payload.setdefault("timestamp", timestamp)
+            if "seq" in payload:
+                payload["device_seq"] = payload.pop("seq")
             if "value" in payload and isinstance(payload["value"], str):
                 payload["value"] = _coerce_value(payload["value"])
             return payload
@@ -65,7 +106,7 @@ class MessageParser:
             "value": value,
             "timestamp": timestamp,
         }
-        self.logger.debug("Parsed payload: %s", payload)
+        self.logger.debug("Parsed payload: %s", payload, extra=PER_MESSAGE)
         return payload
 
     @staticmethod
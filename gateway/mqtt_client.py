@@ -1,17 +1,88 @@
-"""MQTT client helper with reconnection support."""
+"""MQTT client helper with background reconnection support."""
 
 from __future__ import annotations
 
 import json
 import logging
+import select
+import socket
+import threading
 import time
-from typing import Callable, Optional
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
 
 import paho.mqtt.client as mqtt
 
+from iot_lab.log_pipeline import PER_MESSAGE
+
+from .backoff import Backoff
+
+# Highest priority first
+LANE_ORDER = ("control", "alerts", "telemetry")
+
+DEFAULT_LANES: Dict[str, Dict[str, Any]] = {
+    "control": {"qos": 1, "max_pending": 100, "latency_budget_ms": 50},
+    "alerts": {"qos": 1, "max_pending": 1000, "latency_budget_ms": 100},
+    "telemetry": {"qos": 0},
+}
+
+
+class Lane:
+    """Bounded outbound queue for one priority class of messages.
+
+    When full, the oldest message is dropped. Time spent queued is tracked
+    against ``latency_budget`` (seconds), if one is set.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        qos: int = 0,
+        max_pending: int = 10000,
+        latency_budget: Optional[float] = None,
+    ) -> None:
+        self.name = name
+        self.qos = qos
+        self.max_pending = max_pending
+        self.latency_budget = latency_budget
+        self.queue: Deque[Tuple[float, str, str | bytes, int, bool]] = deque()
+        self.sent = 0
+        self.dropped = 0
+        self.max_latency = 0.0
+        self.over_budget = 0
+
+    def __len__(self) -> int:
+        return len(self.queue)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self.queue),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "max_latency_ms": self.max_latency * 1000,
+            "over_budget": self.over_budget,
+        }
+
 
 class MQTTClient:
-    """Wrapper around :mod:`paho.mqtt` with sensible defaults."""
+    """Wrapper around :mod:`paho.mqtt` with sensible defaults.
+
+    The network loop and all (re)connection attempts run on a background
+    thread with exponential backoff and jitter. That thread is the only one
+    that calls paho: :meth:`publish` only queues the message and wakes it
+    through a socket pair it selects on next to the broker socket, so it
+    never blocks the caller.
+
+    Outgoing messages go through priority lanes (``control`` > ``alerts`` >
+    ``telemetry``), each with its own QoS and bound. Higher lanes are always
+    handed to paho first. Telemetry is only handed over while paho has
+    nothing left to write, at most ``bulk_batch`` messages at a time, so a
+    telemetry backlog waits in its lane instead of in paho's first-in
+    first-out socket queue and a command acknowledgement or alert overtakes
+    it. Messages published while the broker is unreachable stay in their
+    lanes (oldest dropped first when full) and are sent, by priority and in
+    order, once the connection is back.
+    """
 
     def __init__(
         self,
@@ -21,6 +92,10 @@ class MQTTClient:
         on_command: Optional[Callable[[str], None]] = None,
         reconnect_interval: float = 5.0,
         logger: Optional[logging.Logger] = None,
+        max_pending: int = 10000,
+        lanes: Optional[Dict[str, Dict[str, Any]]] = None,
+        bulk_batch: int = 64,
+        clock: Callable[[], float] = time.monotonic,
     ) -> None:
         self.host = host
         self.port = port
@@ -34,20 +109,73 @@ class MQTTClient:
         if on_command and command_topic:
             self.client.on_message = self._on_message
         self._connected = False
+        self.max_pending = max_pending
+        self.bulk_batch = bulk_batch
+        self.clock = clock
+        self.lanes: Dict[str, Lane] = {}
+        for name in LANE_ORDER:
+            lane_cfg = {**DEFAULT_LANES[name], **((lanes or {}).get(name) or {})}
+            budget = lane_cfg.get("latency_budget_ms")
+            self.lanes[name] = Lane(
+                name,
+                qos=int(lane_cfg.get("qos", 0)),
+                max_pending=int(lane_cfg.get("max_pending", max_pending)),
+                latency_budget=float(budget) / 1000 if budget else None,
+            )
+        unknown = set(lanes or {}) - set(LANE_ORDER)
+        if unknown:
+            raise ValueError(f"Unknown MQTT lanes: {', '.join(sorted(unknown))}")
+        self._connected_at = 0.0
+        self._lock = threading.Lock()
+        # Notified by the network thread when it takes messages out of the lanes
+        self._room = threading.Condition(self._lock)
+        self._stopping = threading.Event()
+        self._connected_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Set by the network thread while nothing is queued or unwritten
+        self._flushed = threading.Event()
+        self._flushed.set()
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        self._wake_writer.setblocking(False)
+        self._wake_pending = False
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected
+
+    @property
+    def dropped(self) -> int:
+        """Messages dropped from full lanes so far."""
+
+        return sum(lane.dropped for lane in self.lanes.values())
+
+    def lane_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: lane.stats() for name, lane in self.lanes.items()}
 
     def _on_connect(self, client: mqtt.Client, _userdata, _flags, rc):  # type: ignore[override]
         if rc == 0:
             self.logger.info("Connected to MQTT broker at %s:%s", self.host, self.port)
-            self._connected = True
             if self.on_command and self.command_topic:
                 client.subscribe(self.command_topic)
                 self.logger.info("Subscribed to command topic %s", self.command_topic)
+            with self._lock:
+                self._connected = True
+                self._connected_at = self.clock()
+                if self._has_pending():
+                    self.logger.info(
+                        "Sending %s messages buffered while offline",
+                        sum(len(lane) for lane in self.lanes.values()),
+                    )
+                self._drain()
+            self._connected_event.set()
         else:
             self.logger.error("MQTT connection failed with code %s", rc)
 
     def _on_disconnect(self, _client: mqtt.Client, _userdata, rc):  # type: ignore[override]
         self.logger.warning("MQTT disconnected (code %s)", rc)
         self._connected = False
+        self._connected_event.clear()
 
     def _on_message(self, _client: mqtt.Client, _userdata, msg):  # type: ignore[override]
         payload = msg.payload.decode("utf-8", errors="ignore")
@@ -55,46 +183,233 @@ class MQTTClient:
         if self.on_command:
             self.on_command(payload)
 
-    def connect(self) -> None:
-        while not self._connected:
+    def connect(self, timeout: Optional[float] = None) -> bool:
+        """Start the background connection loop.
+
+        Returns immediately unless ``timeout`` is given, in which case it waits
+        up to that many seconds for the broker. Returns whether the client is
+        connected.
+        """
+
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="mqtt-network", daemon=True
+            )
+            self._thread.start()
+        if timeout:
+            self._connected_event.wait(timeout)
+        return self._connected
+
+    def _run(self) -> None:
+        backoff = Backoff(maximum=self.reconnect_interval)
+        while not self._stopping.is_set():
+            sock = self.client.socket()
+            if sock is None:
+                try:
+                    self.logger.info("Connecting to MQTT broker at %s:%s", self.host, self.port)
+                    self.client.connect(self.host, self.port, keepalive=60)
+                except Exception as exc:  # noqa: BLE001 - broad to keep retrying
+                    delay = backoff.next_delay()
+                    self.logger.warning(
+                        "MQTT connection error: %s. Retrying in %.1fs", exc, delay
+                    )
+                    self._stopping.wait(delay)
+                continue
+            rc = self._service(sock)
+            if rc == mqtt.MQTT_ERR_SUCCESS:
+                if self._connected:
+                    backoff.reset()
+                continue
+            self._connected = False
+            self._connected_event.clear()
+            if self._stopping.is_set():
+                break
+            delay = backoff.next_delay()
+            self.logger.warning(
+                "MQTT connection lost (%s). Reconnecting in %.1fs",
+                mqtt.error_string(rc),
+                delay,
+            )
+            self._stopping.wait(delay)
+        if self.client.socket() is not None:
+            # Sent straight away: outside ``loop_start`` paho writes from the calling thread
+            self.client.disconnect()
+
+    def _service(self, sock: Any) -> int:
+        """One pass of the network loop: drain the lanes, then wait for the socket."""
+
+        with self._lock:
+            self._wake_pending = False
+            if self._connected:
+                self._drain()
+            pending = self._has_pending()
+            want_write = self.client.want_write()
+            if not pending and not want_write:
+                self._flushed.set()
+        # With a backlog and a free socket, come straight back to drain it;
+        # otherwise wait for traffic, a wake-up or for the socket to become writable
+        backlog = pending and self._connected and not want_write
+        try:
+            readable, writable, _ = select.select(
+                [sock, self._wake_reader], [sock] if want_write else [], [], 0.0 if backlog else 1.0
+            )
+        except (OSError, ValueError, TypeError):
+            return mqtt.MQTT_ERR_CONN_LOST
+        if self._wake_reader in readable:
             try:
-                self.logger.info("Connecting to MQTT broker at %s:%s", self.host, self.port)
-                self.client.connect(self.host, self.port, keepalive=60)
-                self.client.loop_start()
-                # loop_start triggers connection asynchronously; wait until connected
-                for _ in range(20):
-                    if self._connected:
-                        break
-                    time.sleep(0.1)
-                if not self._connected:
-                    raise ConnectionError("MQTT connection timeout")
-            except Exception as exc:  # noqa: BLE001 - broad to keep retrying
+                self._wake_reader.recv(4096)
+            except BlockingIOError:
+                pass
+        if sock in readable:
+            rc = self.client.loop_read()
+            if rc != mqtt.MQTT_ERR_SUCCESS or self.client.socket() is None:
+                return rc or mqtt.MQTT_ERR_CONN_LOST
+        if sock in writable:
+            rc = self.client.loop_write()
+            if rc != mqtt.MQTT_ERR_SUCCESS or self.client.socket() is None:
+                return rc or mqtt.MQTT_ERR_CONN_LOST
+        return self.client.loop_misc()
+
+    def _wake(self) -> None:
+        try:
+            self._wake_writer.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass  # Already awake, or a wake-up is waiting to be read
+
+    def _has_pending(self) -> bool:
+        return any(lane.queue for lane in self.lanes.values())
+
+    def _enqueue(self, lane: Lane, message: Tuple[float, str, str | bytes, int, bool]) -> None:
+        if len(lane.queue) >= lane.max_pending:
+            lane.queue.popleft()
+            lane.dropped += 1
+            if lane.dropped == 1 or lane.dropped % 1000 == 0:
+                self.logger.warning(
+                    "MQTT %s lane full; %s messages dropped so far", lane.name, lane.dropped
+                )
+        lane.queue.append(message)
+
+    def _drain(self) -> None:
+        """Hand queued messages to paho, highest lane first.
+
+        Only called on the network thread, with the lock held.
+        """
+
+        for name in LANE_ORDER:
+            lane = self.lanes[name]
+            bulk = name == "telemetry"
+            budget = self.bulk_batch
+            if lane.queue and self._connected:
+                self._room.notify_all()
+            while lane.queue and self._connected:
+                if bulk and (budget <= 0 or self.client.want_write()):
+                    # Leave the rest for the next pass, once the socket has caught up
+                    return
+                enqueued_at, topic, payload, qos, retain = lane.queue[0]
+                try:
+                    info = self.client.publish(topic, payload, qos=qos, retain=retain)
+                except Exception as exc:  # noqa: BLE001 - maintain gateway uptime
+                    self.logger.error("Failed to publish MQTT message: %s", exc)
+                    return
+                if info.rc == mqtt.MQTT_ERR_NO_CONN:
+                    self._connected = False
+                    return
+                lane.queue.popleft()
+                budget -= 1
+                if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                    self.logger.error(
+                        "Failed to publish MQTT message: %s", mqtt.error_string(info.rc)
+                    )
+                    continue
+                self._record_sent(lane, enqueued_at)
+                self.logger.info("Published to %s: %s", topic, payload, extra=PER_MESSAGE)
+
+    def _record_sent(self, lane: Lane, enqueued_at: float) -> None:
+        latency = self.clock() - enqueued_at
+        lane.sent += 1
+        if latency > lane.max_latency:
+            lane.max_latency = latency
+        if not lane.latency_budget or latency <= lane.latency_budget:
+            return
+        # Time spent offline does not count against the budget
+        if enqueued_at >= self._connected_at:
+            lane.over_budget += 1
+            if lane.over_budget == 1 or lane.over_budget % 100 == 0:
                 self.logger.warning(
-                    "MQTT connection error: %s. Retrying in %ss",
-                    exc,
-                    self.reconnect_interval,
+                    "MQTT %s lane over its %.0f ms latency budget (%.1f ms); %s times so far",
+                    lane.name,
+                    lane.latency_budget * 1000,
+                    latency * 1000,
+                    lane.over_budget,
                 )
-                time.sleep(self.reconnect_interval)
 
-    def publish(self, topic: str, payload: str | bytes, qos: int = 0, retain: bool = False) -> None:
-        if not self._connected:
+    def publish(
+        self,
+        topic: str,
+        payload: str | bytes,
+        qos: Optional[int] = None,
+        retain: bool = False,
+        lane: str = "telemetry",
+        block: bool = False,
+    ) -> bool:
+        """Queue ``payload`` on ``lane``; returns ``False`` if it was buffered offline.
+
+        ``qos`` defaults to the lane's QoS. The network thread sends it. A
+        full lane drops its oldest message, unless ``block`` is set: then the
+        call waits until the network thread has made room (or the client is
+        stopped), so a bulk sender such as the replay tool is slowed down to
+        what the broker takes instead of losing messages.
+        """
+
+        target = self.lanes.get(lane)
+        if target is None:
+            raise ValueError(f"Unknown MQTT lane '{lane}'. Choose from: {', '.join(LANE_ORDER)}")
+        if self._thread is None:
             self.connect()
 
-        try:
-            info = self.client.publish(topic, payload, qos=qos, retain=retain)
-            info.wait_for_publish()
-            self.logger.info("Published to %s: %s", topic, payload)
-        except Exception as exc:  # noqa: BLE001 - maintain gateway uptime
-            self.logger.error("Failed to publish MQTT message: %s", exc)
-            self._connected = False
-            time.sleep(self.reconnect_interval)
+        message = (self.clock(), topic, payload, target.qos if qos is None else qos, retain)
+        with self._lock:
+            if block:
+                self._room.wait_for(
+                    lambda: len(target.queue) < target.max_pending or self._stopping.is_set()
+                )
+            self._enqueue(target, message)
+            self._flushed.clear()
+            wake = not self._wake_pending
+            self._wake_pending = True
+        if wake:
+            self._wake()
+        return self._connected
+
+    def stop(self, flush_timeout: float = 2.0) -> int:
+        """Send what is queued, waiting up to ``flush_timeout`` seconds, then disconnect.
+
+        Returns how many messages were dropped, from full lanes or because
+        they were still queued when the timeout ran out.
+        """
 
-    def stop(self) -> None:
-        if self._connected:
+        if self._thread is not None and self._thread.is_alive():
+            if not self._flushed.wait(flush_timeout):
+                self.logger.warning("MQTT lanes not flushed within %.1fs", flush_timeout)
             self.logger.info("Stopping MQTT client")
-            self.client.loop_stop()
-            self.client.disconnect()
-            self._connected = False
+            self._stopping.set()
+            self._wake()
+            self._thread.join(timeout=2)
+        self._stopping.set()
+        self._thread = None
+        self._connected = False
+        self._connected_event.clear()
+        with self._lock:
+            self._room.notify_all()
+            unsent = 0
+            for lane in self.lanes.values():
+                unsent += len(lane.queue)
+                lane.dropped += len(lane.queue)
+                lane.queue.clear()
+        if unsent:
+            self.logger.warning("Discarded %s unsent MQTT messages on shutdown", unsent)
+        return self.dropped
 
     @staticmethod
     def to_payload(data: dict) -> str:
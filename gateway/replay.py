@@ -0,0 +1,361 @@
+"""Replay a recorded session to MQTT at its original pace or faster.
+
+Captures are streamed from disk, so files larger than memory can be replayed:
+
+* ``.csv``: a dashboard export (one message per row, header line first)
+* ``.jsonl`` / ``.ndjson``: one JSON message per line
+* ``.json``: one JSON array of messages (read into memory as a whole)
+* ``.snapshot`` / ``.bin``: a dashboard snapshot (see :mod:`dashboard.snapshots`)
+
+Messages are scheduled by their ``timestamp`` relative to the first one and
+published to their recorded ``topic`` (or ``--topic``). ``--speed 10`` plays
+ten times faster, ``--speed 0`` as fast as possible. Recorded ``seq``
+numbers are replaced by a fresh count under a ``replay-`` session, so a
+dashboard that saw the original messages does not drop the replay as
+duplicates; ``--keep-seq`` publishes them unchanged.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from iot_lab import PayloadCodec, configure_logging, load_config
+
+from .sequencing import SequenceStamper, new_session_id
+
+LOGGER = logging.getLogger("gateway.replay")
+
+FORMATS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".json": "json",
+    ".snapshot": "snapshot",
+    ".bin": "snapshot",
+}
+
+
+def _csv_value(text: str) -> Any:
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _read_csv(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, newline="", encoding="utf-8") as handle:
+        for row in csv.DictReader(handle):
+            # Empty cells are columns the message did not have
+            yield {key: _csv_value(text) for key, text in row.items() if key and text != ""}
+
+
+def _read_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as handle:
+        for line_number, line in enumerate(handle, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                message = json.loads(line)
+            except ValueError as exc:
+                LOGGER.warning("Skipping line %s of %s: %s", line_number, path, exc)
+                continue
+            if isinstance(message, dict):
+                yield message
+
+
+def _read_json(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as handle:
+        try:
+            document = json.load(handle)
+        except ValueError as exc:
+            raise ValueError(f"{path} is not a JSON document: {exc}") from exc
+    messages = document if isinstance(document, list) else [document]
+    for message in messages:
+        if isinstance(message, dict):
+            yield message
+
+
+def _read_snapshot(path: Path) -> Iterator[Dict[str, Any]]:
+    from dashboard.snapshots import iter_snapshot  # Only needed for this format
+
+    for _received_at, record in iter_snapshot(path):
+        yield dict(record)
+
+
+def read_capture(path: str | Path, fmt: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Stream the messages of a capture file, in file order."""
+
+    path = Path(path)
+    fmt = fmt or FORMATS.get(path.suffix.lower())
+    readers = {
+        "csv": _read_csv,
+        "jsonl": _read_jsonl,
+        "json": _read_json,
+        "snapshot": _read_snapshot,
+    }
+    if fmt not in readers:
+        raise ValueError(
+            f"Cannot tell the capture format of {path}; pass one of: {', '.join(readers)}"
+        )
+    return readers[fmt](path)
+
+
+class ReplayStats:
+    """Outcome of a replay: throughput and lag against the schedule.
+
+    ``messages`` counts messages handed to ``publish``. ``sent`` is how many
+    the client reports as sent, when it reports it, and ``dropped`` is set
+    afterwards to those it could not deliver. Rate and summary are based on
+    the messages sent.
+    """
+
+    def __init__(self) -> None:
+        self.messages = 0
+        self.sent: Optional[int] = None
+        self.buffered = 0
+        self.dropped = 0
+        self.elapsed = 0.0
+        self.span = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.late = 0
+
+    @property
+    def published(self) -> int:
+        return self.sent if self.sent is not None else self.messages - self.dropped
+
+    @property
+    def rate(self) -> float:
+        """Messages sent per second of wall time."""
+
+        return self.published / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mean_lag(self) -> float:
+        return self.total_lag / self.messages if self.messages else 0.0
+
+    def record(self, lag: float, late_after: float) -> None:
+        self.messages += 1
+        if lag > 0:
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+            if lag > late_after:
+                self.late += 1
+
+    def summary(self) -> str:
+        speed = self.span / self.elapsed if self.elapsed else 0.0
+        return (
+            f"{self.published} of {self.messages} messages sent in {self.elapsed:.2f}s "
+            f"({self.rate:.0f} msg/s, "
+            f"{speed:.1f}x recorded time); lag mean {self.mean_lag * 1000:.1f} ms, "
+            f"max {self.max_lag * 1000:.1f} ms, {self.late} late; {self.buffered} buffered offline, "
+            f"{self.dropped} dropped"
+        )
+
+
+class Replayer:
+    """Publish recorded messages on the schedule given by their timestamps.
+
+    Message ``n`` is due ``(timestamp_n - timestamp_0) / speed`` seconds after
+    the replay started; ``speed`` of 0 publishes without waiting. A message
+    published after its due time counts as lag, and as late beyond
+    ``late_after`` seconds. Timestamps that go backwards are published
+    immediately. Messages go to their recorded topic unless
+    ``recorded_topics`` is false; ``topic`` is the fallback. With
+    ``rebase_timestamps`` the payload timestamps are moved to the replay's
+    wall clock so dashboards plot them as live data. With ``renumber``
+    (the default) each message gets a new ``seq`` and ``session`` from a
+    :class:`~gateway.sequencing.SequenceStamper` of its own. ``sent``, if
+    given, returns how many messages the client has actually sent so far,
+    which the stats report instead of the messages handed to ``publish``.
+    ``publish`` should block while the client cannot take more messages.
+
+    :attr:`stats` is updated as the replay runs, so it is still meaningful
+    when a replay is interrupted.
+    """
+
+    def __init__(
+        self,
+        publish: Callable[[str, bytes], Any],
+        topic: str,
+        codec: Optional[PayloadCodec] = None,
+        speed: float = 1.0,
+        recorded_topics: bool = True,
+        rebase_timestamps: bool = False,
+        renumber: bool = True,
+        sent: Optional[Callable[[], int]] = None,
+        late_after: float = 0.05,
+        report_interval: float = 10.0,
+        clock: Callable[[], float] = time.perf_counter,
+        sleep: Callable[[float], None] = time.sleep,
+        wall_clock: Callable[[], float] = time.time,
+    ) -> None:
+        if speed < 0:
+            raise ValueError("Replay speed must be positive, or 0 for as fast as possible")
+        self.publish = publish
+        self.topic = topic
+        self.codec = codec or PayloadCodec()
+        self.speed = speed
+        self.recorded_topics = recorded_topics
+        self.rebase_timestamps = rebase_timestamps
+        self.sequencer = SequenceStamper(f"replay-{new_session_id()}") if renumber else None
+        self.sent = sent
+        self.late_after = late_after
+        self.report_interval = report_interval
+        self.clock = clock
+        self.sleep = sleep
+        self.wall_clock = wall_clock
+        self.stats = ReplayStats()
+        self._stopping = False
+
+    def stop(self) -> None:
+        self._stopping = True
+
+    def _split(self, message: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        payload = dict(message)
+        # The dashboard records the topic a message arrived on; it is not part of the payload
+        topic = payload.pop("topic", None)
+        if self.recorded_topics and isinstance(topic, str) and topic:
+            return topic, payload
+        return self.topic, payload
+
+    def run(self, messages: Iterable[Dict[str, Any]]) -> ReplayStats:
+        stats = self.stats = ReplayStats()
+        self._stopping = False
+        started = self.clock()
+        try:
+            self._play(messages, stats, started)
+        finally:
+            stats.elapsed = self.clock() - started
+            if self.sent is not None:
+                stats.sent = self.sent()
+        return stats
+
+    def _play(self, messages: Iterable[Dict[str, Any]], stats: ReplayStats, started: float) -> None:
+        wall_started = self.wall_clock()
+        next_report = started + self.report_interval
+        first_time: Optional[float] = None
+        last_time: Optional[float] = None
+        for message in messages:
+            if self._stopping:
+                break
+            topic, payload = self._split(message)
+            timestamp = payload.get("timestamp")
+            if not isinstance(timestamp, (int, float)) or isinstance(timestamp, bool):
+                timestamp = last_time if last_time is not None else 0.0
+            if first_time is None:
+                first_time = last_time = timestamp
+            last_time = max(last_time, timestamp)
+            stats.span = last_time - first_time
+            offset = timestamp - first_time
+
+            now = self.clock()
+            due = started + offset / self.speed if self.speed else now
+            if due > now:
+                self.sleep(due - now)
+                now = self.clock()
+            if self.rebase_timestamps and "timestamp" in payload:
+                payload["timestamp"] = wall_started + (now - started)
+            if self.sequencer is not None:
+                self.sequencer.stamp(payload)
+            if self.publish(topic, self.codec.encode(payload)) is False:
+                stats.buffered += 1
+            stats.record(self.clock() - due, self.late_after)
+
+            if now >= next_report:
+                stats.elapsed = now - started
+                if self.sent is not None:
+                    stats.sent = self.sent()
+                LOGGER.info("Replay progress: %s", stats.summary())
+                next_report = now + self.report_interval
+
+
+def run_replay(argv: Optional[list] = None) -> ReplayStats:
+    arg_parser = argparse.ArgumentParser(description="Replay a recorded capture to MQTT.")
+    arg_parser.add_argument("capture", help="CSV, JSONL, JSON or dashboard snapshot file")
+    arg_parser.add_argument(
+        "--speed", type=float, default=1.0, help="playback speed, 0 for as fast as possible"
+    )
+    arg_parser.add_argument("--format", choices=["csv", "jsonl", "json", "snapshot"])
+    arg_parser.add_argument("--topic", help="publish every message to this topic")
+    arg_parser.add_argument(
+        "--rebase-time", action="store_true", help="shift timestamps to the current time"
+    )
+    arg_parser.add_argument(
+        "--flush-timeout",
+        type=float,
+        default=30.0,
+        help="seconds to wait for queued messages to be sent at the end",
+    )
+    arg_parser.add_argument(
+        "--keep-seq", action="store_true", help="publish the recorded seq and session unchanged"
+    )
+    args = arg_parser.parse_args(argv)
+
+    from .mqtt_client import MQTTClient  # Local import to avoid hard dependency in tests
+
+    config = load_config()
+    configure_logging(config)
+    mqtt_cfg = config.get("mqtt", {})
+    mqtt_client = MQTTClient(
+        host=mqtt_cfg.get("host", "localhost"),
+        port=int(mqtt_cfg.get("port", 1883)),
+        reconnect_interval=float(mqtt_cfg.get("reconnect_interval", 5)),
+        max_pending=int(mqtt_cfg.get("max_pending", 10000)),
+    )
+    topic = args.topic or mqtt_cfg.get("publish_topic", "lab/device1/data")
+    telemetry = mqtt_client.lanes["telemetry"]
+
+    def publish(topic: str, payload: bytes) -> bool:
+        # Wait for room in the lane rather than pushing out older messages
+        return mqtt_client.publish(topic, payload, block=True)
+
+    replayer = Replayer(
+        publish=publish,
+        topic=topic,
+        codec=PayloadCodec.from_config(mqtt_cfg),
+        speed=args.speed,
+        recorded_topics=not args.topic,
+        rebase_timestamps=args.rebase_time,
+        renumber=not args.keep_seq,
+        sent=lambda: telemetry.sent,
+    )
+    if not mqtt_client.connect(timeout=5):
+        LOGGER.warning(
+            "MQTT broker not reachable yet; the replay pauses once %s messages are queued",
+            telemetry.max_pending,
+        )
+    try:
+        replayer.run(read_capture(args.capture, args.format))
+    except KeyboardInterrupt:
+        LOGGER.info("Replay interrupted")
+    finally:
+        stats = replayer.stats
+        flush_started = time.perf_counter()
+        # Whatever is still queued after the flush timeout is dropped and counted
+        stats.dropped = mqtt_client.stop(flush_timeout=args.flush_timeout)
+        stats.elapsed += time.perf_counter() - flush_started
+        stats.sent = telemetry.sent
+    LOGGER.info("Replay finished: %s", stats.summary())
+    if stats.published < stats.messages:
+        LOGGER.error(
+            "Replay incomplete: %s of %s messages were not sent to the broker",
+            stats.messages - stats.published,
+            stats.messages,
+        )
+    return stats
+
+
+if __name__ == "__main__":
+    stats = run_replay()
+    sys.exit(1 if stats.published < stats.messages else 0)
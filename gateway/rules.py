@@ -0,0 +1,283 @@
+"""Threshold, rate-of-change and stuck-value alert rules for parsed readings."""
+
+from __future__ import annotations
+
+import math
+import time
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+RULE_TYPES = ("threshold", "rate", "stuck")
+
+
+def _optional_float(value: Any) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+class Rule:
+    """One alert rule as written in the ``gateway.rules`` config section.
+
+    * ``threshold``: alert while the value is ``above`` and/or ``below`` a limit
+    * ``rate``: the same limits applied to the change per second
+    * ``stuck``: alert once the value stayed within ``tolerance`` for
+      ``duration`` seconds
+
+    ``hysteresis`` keeps an alert active until the signal is back inside the
+    limit by that margin, so a value hovering at the limit does not flap.
+    ``sensor`` and ``device`` restrict the rule; left out they match any.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        kind: str = "threshold",
+        sensor: Any = None,
+        device: Any = None,
+        above: Optional[float] = None,
+        below: Optional[float] = None,
+        hysteresis: float = 0.0,
+        duration: Optional[float] = None,
+        tolerance: float = 0.0,
+        severity: str = "warning",
+    ) -> None:
+        if kind not in RULE_TYPES:
+            raise ValueError(
+                f"Rule '{name}': unknown type '{kind}'. Choose from: {', '.join(RULE_TYPES)}"
+            )
+        if kind == "stuck":
+            if duration is None or duration <= 0:
+                raise ValueError(f"Rule '{name}': stuck rules need a positive 'duration'")
+        elif above is None and below is None:
+            raise ValueError(f"Rule '{name}': set 'above' and/or 'below'")
+        if hysteresis < 0 or tolerance < 0:
+            raise ValueError(f"Rule '{name}': 'hysteresis' and 'tolerance' cannot be negative")
+        self.name = name
+        self.kind = kind
+        self.sensor = sensor
+        self.device = device
+        self.above = above
+        self.below = below
+        self.hysteresis = hysteresis
+        self.duration = duration
+        self.tolerance = tolerance
+        self.severity = severity
+
+    @classmethod
+    def from_config(cls, rule_cfg: Dict[str, Any], index: int = 0) -> "Rule":
+        return cls(
+            name=str(rule_cfg.get("name") or f"rule{index}"),
+            kind=str(rule_cfg.get("type", "threshold")),
+            sensor=rule_cfg.get("sensor"),
+            device=rule_cfg.get("device"),
+            above=_optional_float(rule_cfg.get("above")),
+            below=_optional_float(rule_cfg.get("below")),
+            hysteresis=float(rule_cfg.get("hysteresis", 0.0)),
+            duration=_optional_float(rule_cfg.get("duration")),
+            tolerance=float(rule_cfg.get("tolerance", 0.0)),
+            severity=str(rule_cfg.get("severity", "warning")),
+        )
+
+    def matches(self, device: Any, sensor: Any) -> bool:
+        return (self.sensor is None or self.sensor == sensor) and (
+            self.device is None or self.device == device
+        )
+
+
+class _Condition:
+    """One limit of a rule, normalised so that it fires when a signal rises."""
+
+    __slots__ = ("rule", "direction", "limit", "trigger", "clear", "active")
+
+    def __init__(self, rule: Rule, direction: str, limit: float, sign: float, margin: float) -> None:
+        self.rule = rule
+        self.direction = direction
+        self.limit = limit
+        # ``below`` limits are stored negated so every condition reads "signal > trigger"
+        self.trigger = sign * limit
+        self.clear = self.trigger - margin
+        self.active = False
+
+
+class _LimitIndex:
+    """All conditions on one signal, sorted by trigger and by clear level.
+
+    A condition becomes active when the signal rises above its trigger and
+    inactive when it falls below its clear level. Both levels are kept in
+    sorted arrays, so a new sample only visits the conditions whose levels lie
+    between the previous sample and the new one: two binary searches plus the
+    conditions that actually change, however many conditions there are.
+    """
+
+    __slots__ = ("_triggers", "_by_trigger", "_clears", "_by_clear", "_last")
+
+    def __init__(self, conditions: List[_Condition]) -> None:
+        by_trigger = sorted(conditions, key=lambda condition: condition.trigger)
+        by_clear = sorted(conditions, key=lambda condition: condition.clear)
+        self._triggers = [condition.trigger for condition in by_trigger]
+        self._by_trigger = by_trigger
+        self._clears = [condition.clear for condition in by_clear]
+        self._by_clear = by_clear
+        self._last: Optional[float] = None
+
+    def update(self, signal: float) -> List[_Condition]:
+        """Feed a sample; returns the conditions whose state flipped."""
+
+        last = self._last
+        self._last = signal
+        changed: List[_Condition] = []
+        if last is None or signal > last:
+            # Conditions with a trigger below ``last`` already fired on ``last``
+            low = 0 if last is None else bisect_left(self._triggers, last)
+            for condition in self._by_trigger[low : bisect_left(self._triggers, signal)]:
+                if not condition.active:
+                    condition.active = True
+                    changed.append(condition)
+        elif signal < last:
+            # Conditions with a clear level above ``last`` already cleared on ``last``
+            high = bisect_right(self._clears, last)
+            for condition in self._by_clear[bisect_right(self._clears, signal) : high]:
+                if condition.active:
+                    condition.active = False
+                    changed.append(condition)
+        return changed
+
+
+class _SensorRules:
+    """Compiled rules of one device/sensor and the state they share.
+
+    The rate and the time a value has been stuck are derived once per reading
+    and then fed to one :class:`_LimitIndex` per signal.
+    """
+
+    __slots__ = ("value_limits", "rate_limits", "stuck_limits", "last_value", "last_time", "runs")
+
+    def __init__(self, rules: Iterable[Rule]) -> None:
+        value: List[_Condition] = []
+        rate: List[_Condition] = []
+        stuck: Dict[float, List[_Condition]] = {}
+        for rule in rules:
+            if rule.kind == "stuck":
+                stuck.setdefault(rule.tolerance, []).append(
+                    _Condition(rule, "stuck", rule.duration, 1.0, 0.0)
+                )
+                continue
+            target = value if rule.kind == "threshold" else rate
+            if rule.above is not None:
+                target.append(_Condition(rule, "above", rule.above, 1.0, rule.hysteresis))
+            if rule.below is not None:
+                target.append(_Condition(rule, "below", rule.below, -1.0, rule.hysteresis))
+        self.value_limits = self._split(value)
+        self.rate_limits = self._split(rate)
+        self.stuck_limits = {
+            tolerance: _LimitIndex(conditions) for tolerance, conditions in stuck.items()
+        }
+        self.last_value: Optional[float] = None
+        self.last_time: Optional[float] = None
+        # tolerance -> (value the run started with, time it started)
+        self.runs: Dict[float, Tuple[float, float]] = {}
+
+    @staticmethod
+    def _split(conditions: List[_Condition]) -> Tuple[Optional[_LimitIndex], Optional[_LimitIndex]]:
+        above = [condition for condition in conditions if condition.direction == "above"]
+        below = [condition for condition in conditions if condition.direction == "below"]
+        return (_LimitIndex(above) if above else None, _LimitIndex(below) if below else None)
+
+    @property
+    def empty(self) -> bool:
+        return (
+            self.value_limits == (None, None)
+            and self.rate_limits == (None, None)
+            and not self.stuck_limits
+        )
+
+    def update(self, value: float, now: float) -> List[Tuple[_Condition, float]]:
+        """Feed a reading; returns ``(condition, signal)`` for every flipped condition."""
+
+        changed: List[Tuple[_Condition, float]] = []
+        self._apply(self.value_limits, value, changed)
+        if self.rate_limits != (None, None):
+            if self.last_time is not None and now > self.last_time:
+                rate = (value - self.last_value) / (now - self.last_time)
+                self._apply(self.rate_limits, rate, changed)
+        self.last_value = value
+        self.last_time = now
+        for tolerance, index in self.stuck_limits.items():
+            run = self.runs.get(tolerance)
+            if run is None or abs(value - run[0]) > tolerance:
+                run = self.runs[tolerance] = (value, now)
+            stuck_for = now - run[1]
+            changed.extend((condition, stuck_for) for condition in index.update(stuck_for))
+        return changed
+
+    @staticmethod
+    def _apply(
+        limits: Tuple[Optional[_LimitIndex], Optional[_LimitIndex]],
+        signal: float,
+        changed: List[Tuple[_Condition, float]],
+    ) -> None:
+        above, below = limits
+        if above is not None:
+            changed.extend((condition, signal) for condition in above.update(signal))
+        if below is not None:
+            changed.extend((condition, signal) for condition in below.update(-signal))
+
+
+class RuleEngine:
+    """Evaluate alert rules against each parsed reading.
+
+    Rules are compiled per device/sensor the first time that sensor reports,
+    and readings of sensors without rules cost one dictionary lookup. Within a
+    sensor, limits are indexed (see :class:`_LimitIndex`), so the cost of a
+    reading does not grow with the number of rules unless they all change
+    state at once. :meth:`evaluate` returns an alert when a rule becomes active
+    and another when it clears.
+    """
+
+    def __init__(self, rules: Iterable[Rule], clock: Callable[[], float] = time.time) -> None:
+        self.rules = list(rules)
+        self.clock = clock
+        self._sensors: Dict[Hashable, Optional[_SensorRules]] = {}
+
+    @classmethod
+    def from_config(cls, rules_cfg: Iterable[Dict[str, Any]]) -> "RuleEngine":
+        return cls(Rule.from_config(rule_cfg, index) for index, rule_cfg in enumerate(rules_cfg))
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def _compile(self, device: Any, sensor: Any) -> Optional[_SensorRules]:
+        compiled = _SensorRules(rule for rule in self.rules if rule.matches(device, sensor))
+        return None if compiled.empty else compiled
+
+    def evaluate(self, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Alerts raised or cleared by ``payload``; usually an empty list."""
+
+        value = payload.get("value")
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or math.isnan(value):
+            return []
+        device = payload.get("device")
+        sensor = payload.get("sensor")
+        key = (device, sensor)
+        try:
+            compiled = self._sensors[key]
+        except KeyError:
+            compiled = self._sensors[key] = self._compile(device, sensor)
+        if compiled is None:
+            return []
+        timestamp = payload.get("timestamp")
+        now = timestamp if isinstance(timestamp, (int, float)) else self.clock()
+        return [
+            {
+                "rule": condition.rule.name,
+                "severity": condition.rule.severity,
+                "state": "active" if condition.active else "cleared",
+                "device": device,
+                "sensor": sensor,
+                "condition": condition.direction,
+                "limit": condition.limit,
+                "signal": signal,
+                "value": value,
+                "timestamp": now,
+            }
+            for condition, signal in compiled.update(float(value), now)
+        ]
@@ -3,9 +3,13 @@
 from __future__ import annotations
 
 import logging
-import time
+import threading
 from typing import Optional
 
+from iot_lab.log_pipeline import PER_MESSAGE
+
+from .backoff import Backoff
+
 try:  # pragma: no cover - optional hardware dependency
     import serial  # type: ignore
     from serial.serialutil import SerialException  # type: ignore
@@ -17,7 +21,14 @@ except ModuleNotFoundError:  # pragma: no cover - fallback for tests
 
 
 class SerialReader:
-    """Read newline-delimited messages from a serial port."""
+    """Read and write newline-delimited messages on a serial port.
+
+    When the port cannot be opened, or fails while in use, reconnection is
+    retried on a background thread with exponential backoff and jitter.
+    Meanwhile :meth:`read_line` and :meth:`write` return immediately so the
+    gateway loop keeps running. After :meth:`close` the port stays closed
+    until :meth:`reopen` is called.
+    """
 
     def __init__(
         self,
@@ -25,66 +36,136 @@ class SerialReader:
         baudrate: int,
         reconnect_interval: float = 5.0,
         logger: Optional[logging.Logger] = None,
+        timeout: float = 1.0,
     ) -> None:
         self.port = port
         self.baudrate = baudrate
         self.reconnect_interval = reconnect_interval
+        self.timeout = timeout
         self._serial: Optional["serial.Serial"] = None  # type: ignore[name-defined]
         self.logger = logger or logging.getLogger(self.__class__.__name__)
+        self._reconnect_thread: Optional[threading.Thread] = None
+        self._closing = threading.Event()
 
     @property
     def is_connected(self) -> bool:
         return bool(self._serial and self._serial.is_open)
 
-    def connect(self) -> None:
-        """Attempt to establish the serial connection."""
+    def _open(self) -> bool:
+        try:
+            self.logger.info("Opening serial port %s at %s baud", self.port, self.baudrate)
+            self._serial = serial.Serial(  # type: ignore[attr-defined]
+                self.port,
+                self.baudrate,
+                timeout=self.timeout,
+                write_timeout=self.timeout,
+            )
+            self.logger.info("Serial connection established")
+            return True
+        except SerialException as exc:
+            self.logger.warning("Unable to open serial port %s: %s", self.port, exc)
+            return False
+
+    @property
+    def is_closed(self) -> bool:
+        return self._closing.is_set()
+
+    def connect(self) -> bool:
+        """Try to open the port once; on failure keep retrying in the background.
+
+        Returns ``False`` without trying once the reader has been closed.
+        """
 
         if serial is None:
             raise ImportError(
                 "pyserial is required to use SerialReader. Install 'pyserial' or run in simulation mode."
             )
 
-        while not self.is_connected:
+        if self._closing.is_set():
+            return False
+        if self.is_connected:
+            return True
+        if self._reconnect_thread is not None and self._reconnect_thread.is_alive():
+            return False
+        if self._open():
+            return True
+        self._reconnect_thread = threading.Thread(
+            target=self._reconnect_loop, name="serial-reconnect", daemon=True
+        )
+        self._reconnect_thread.start()
+        return False
+
+    def _reconnect_loop(self) -> None:
+        backoff = Backoff(maximum=self.reconnect_interval)
+        while not self._closing.is_set():
+            delay = backoff.next_delay()
+            self.logger.info("Retrying serial port %s in %.1fs", self.port, delay)
+            if self._closing.wait(delay):
+                return
+            if self._open():
+                if self._closing.is_set():
+                    # Closed while the port was being opened
+                    self._drop_connection()
+                return
+
+    def _drop_connection(self) -> None:
+        serial_port, self._serial = self._serial, None
+        if serial_port is not None:
             try:
-                self.logger.info(
-                    "Opening serial port %s at %s baud", self.port, self.baudrate
-                )
-                self._serial = serial.Serial(  # type: ignore[attr-defined]
-                    self.port,
-                    self.baudrate,
-                    timeout=1,
-                )
-                self.logger.info("Serial connection established")
-            except SerialException as exc:
-                self.logger.warning(
-                    "Unable to open serial port %s: %s. Retrying in %ss",
-                    self.port,
-                    exc,
-                    self.reconnect_interval,
-                )
-                time.sleep(self.reconnect_interval)
+                serial_port.close()
+            except SerialException:  # pragma: no cover - already broken
+                pass
 
     def close(self) -> None:
+        self._closing.set()
         if self._serial and self._serial.is_open:
             self.logger.info("Closing serial connection")
             self._serial.close()
 
+    def reopen(self) -> bool:
+        """Allow connecting again after :meth:`close` and try to open the port."""
+
+        self._closing.clear()
+        return self.connect()
+
     def read_line(self) -> Optional[str]:
-        """Read a line from the serial connection."""
+        """Read a line from the serial connection, or ``None`` if unavailable."""
 
-        if not self.is_connected:
-            self.connect()
+        if not self.is_connected and not self.connect():
+            return None
 
-        if not self._serial:
+        serial_port = self._serial
+        if not serial_port:
             return None
 
         try:
-            raw = self._serial.readline().decode("utf-8", errors="ignore").strip()
+            raw = serial_port.readline().decode("utf-8", errors="ignore").strip()
             if raw:
-                self.logger.debug("Read from serial: %s", raw)
+                self.logger.debug("Read from serial: %s", raw, extra=PER_MESSAGE)
             return raw or None
         except SerialException as exc:
             self.logger.error("Serial read failed: %s", exc)
-            self.close()
-            time.sleep(self.reconnect_interval)
+            self._drop_connection()
+            self.connect()
             return None
+
+    def write(self, line: str) -> bool:
+        """Write ``line`` followed by a newline; returns ``False`` on failure."""
+
+        if not self.is_connected and not self.connect():
+            return False
+
+        serial_port = self._serial
+        if not serial_port:
+            return False
+
+        try:
+            serial_port.write(line.encode("utf-8") + b"\n")
+            serial_port.flush()
+            self.logger.debug("Wrote to serial: %s", line)
+            return True
+        except SerialException as exc:
+            self.logger.error("Serial write failed: %s", exc)
+            self._drop_connection()
+            self.connect()
+            return False
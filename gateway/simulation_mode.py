@@ -5,10 +5,11 @@ from __future__ import annotations
 import random
 import time
 
-from iot_lab import configure_logging, load_config
+from iot_lab import PayloadCodec, configure_logging, load_config
 
 from .message_parser import MessageParser
 from .mqtt_client import MQTTClient
+from .sequencing import SequenceStamper
 
 
 def run_simulation() -> None:
@@ -19,6 +20,8 @@ def run_simulation() -> None:
     gateway_cfg = config.get("gateway", {})
 
     parser = MessageParser(device_id=gateway_cfg.get("device_id", "simulator"))
+    codec = PayloadCodec.from_config(mqtt_cfg)
+    sequencer = SequenceStamper()
     mqtt_client = MQTTClient(
         host=mqtt_cfg.get("host", "localhost"),
         port=int(mqtt_cfg.get("port", 1883)),
@@ -38,7 +41,7 @@ def run_simulation() -> None:
                 value = round(random.uniform(min_val, max_val), 2)
                 payload = parser.parse(f"{name}:{value}")
                 if payload:
-                    mqtt_client.publish(publish_topic, parser.to_json(payload))
+                    mqtt_client.publish(publish_topic, codec.encode(sequencer.stamp(payload)))
             time.sleep(interval)
     except KeyboardInterrupt:
         mqtt_client.stop()
@@ -0,0 +1,84 @@
+"""High-resolution clocks and device clock offset estimation."""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+
+class AnchoredClock:
+    """Wall-clock time with sub-microsecond resolution that never goes backwards.
+
+    The wall clock is read once as an anchor; later readings add the elapsed
+    :func:`time.perf_counter` time, so NTP steps cannot reorder samples. The
+    anchor is refreshed every ``resync_interval`` seconds to follow slow drift,
+    without ever returning a value smaller than the previous one.
+    """
+
+    def __init__(self, resync_interval: float = 3600.0) -> None:
+        self.resync_interval = resync_interval
+        self._last = 0.0
+        self._anchor()
+
+    def _anchor(self) -> None:
+        self._wall = time.time()
+        self._perf = time.perf_counter()
+
+    def __call__(self) -> float:
+        elapsed = time.perf_counter() - self._perf
+        if elapsed >= self.resync_interval:
+            self._anchor()
+            elapsed = 0.0
+        now = self._wall + elapsed
+        if now < self._last:
+            now = self._last
+        self._last = now
+        return now
+
+
+class ClockOffsetEstimator:
+    """Estimate ``host_time - device_time`` from timestamped samples.
+
+    Each sample's observed offset is the true offset plus the transport delay,
+    which is never negative, so the minimum over a sliding window of recent
+    samples is the best estimate. The window lets the estimate follow clock
+    drift. The minimum is maintained with a monotonic deque in O(1) amortised
+    time per sample.
+
+    A sample whose offset is more than ``reset_threshold`` seconds above the
+    estimate means the device clock was reset (e.g. the board rebooted), so
+    the window restarts from that sample instead of keeping the stale offset.
+    A single badly delayed sample costs at most that sample, because the next
+    normal one is lower and becomes the minimum again.
+    """
+
+    def __init__(self, window: int = 256, reset_threshold: Optional[float] = 1.0) -> None:
+        self.window = window
+        self.reset_threshold = reset_threshold
+        self.resets = 0
+        self._count = 0
+        # (sample index, offset) pairs with increasing offsets
+        self._candidates: Deque[Tuple[int, float]] = deque()
+
+    @property
+    def offset(self) -> Optional[float]:
+        return self._candidates[0][1] if self._candidates else None
+
+    def update(self, host_time: float, device_time: float) -> float:
+        observed = host_time - device_time
+        index = self._count
+        self._count += 1
+        if (
+            self.reset_threshold is not None
+            and self._candidates
+            and observed - self._candidates[0][1] > self.reset_threshold
+        ):
+            self._candidates.clear()
+            self.resets += 1
+        while self._candidates and self._candidates[-1][1] >= observed:
+            self._candidates.pop()
+        self._candidates.append((index, observed))
+        while self._candidates[0][0] <= index - self.window:
+            self._candidates.popleft()
+        return self._candidates[0][1]
@@ -1,5 +1,6 @@
 """Shared utilities for the IoT lab platform."""
 
+from .codecs import PayloadCodec, decode_payload
 from .config import load_config, configure_logging
 
-__all__ = ["load_config", "configure_logging"]
+__all__ = ["load_config", "configure_logging", "PayloadCodec", "decode_payload"]
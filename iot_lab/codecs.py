@@ -0,0 +1,195 @@
+"""Payload codecs for the MQTT hop between gateway and dashboard.
+
+Plain JSON is sent as-is so existing subscribers keep working. Every other
+encoding is framed with a three byte header: the marker ``0xC1`` (never valid
+as the first byte of UTF-8 text or of a MessagePack/CBOR value), a codec
+identifier and a flags byte. :func:`decode_payload` reads the header and
+picks the matching decoder, so consumers need no configuration.
+
+The binary codecs also replace the well-known field names (``device``,
+``sensor``, ``value`` ...) with small integers, which removes most of the
+per-message key overhead of JSON.
+"""
+
+from __future__ import annotations
+
+import json
+import zlib
+from typing import Any, Callable, Dict, Optional
+
+try:  # pragma: no cover - optional dependency
+    import msgpack  # type: ignore
+except ModuleNotFoundError:  # pragma: no cover - fallback
+    msgpack = None
+
+try:  # pragma: no cover - optional dependency
+    import cbor2  # type: ignore
+except ModuleNotFoundError:  # pragma: no cover - fallback
+    cbor2 = None
+
+FRAME_MARKER = 0xC1
+FLAG_ZLIB = 0x01
+
+# Append only: the position of a name is its wire identifier
+FIELD_NAMES = (
+    "device",
+    "sensor",
+    "value",
+    "timestamp",
+    "seq",
+    "topic",
+    "count",
+    "min",
+    "max",
+    "mean",
+    "stddev",
+    "window_start",
+    "window_end",
+    "session",
+)
+_FIELD_IDS = {name: index for index, name in enumerate(FIELD_NAMES)}
+
+
+def _compact_keys(payload: Any) -> Any:
+    if isinstance(payload, dict):
+        return {_FIELD_IDS.get(key, key): _compact_keys(value) for key, value in payload.items()}
+    if isinstance(payload, list):
+        return [_compact_keys(item) for item in payload]
+    return payload
+
+
+def _expand_keys(payload: Any) -> Any:
+    if isinstance(payload, dict):
+        return {
+            FIELD_NAMES[key] if type(key) is int and 0 <= key < len(FIELD_NAMES) else key: _expand_keys(value)
+            for key, value in payload.items()
+        }
+    if isinstance(payload, list):
+        return [_expand_keys(item) for item in payload]
+    return payload
+
+
+def _json_dumps(payload: Any) -> bytes:
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def _json_loads(body: bytes) -> Any:
+    return json.loads(body)
+
+
+def _msgpack_dumps(payload: Any) -> bytes:
+    return msgpack.packb(_compact_keys(payload), use_bin_type=True)
+
+
+def _msgpack_loads(body: bytes) -> Any:
+    return _expand_keys(msgpack.unpackb(body, raw=False, strict_map_key=False))
+
+
+def _cbor_dumps(payload: Any) -> bytes:
+    return cbor2.dumps(_compact_keys(payload))
+
+
+def _cbor_loads(body: bytes) -> Any:
+    return _expand_keys(cbor2.loads(body))
+
+
+# name -> (wire identifier, encoder, decoder, required module)
+_CODECS: Dict[str, tuple] = {
+    "json": (ord("j"), _json_dumps, _json_loads, "json"),
+    "msgpack": (ord("m"), _msgpack_dumps, _msgpack_loads, "msgpack"),
+    "cbor": (ord("c"), _cbor_dumps, _cbor_loads, "cbor2"),
+}
+_DECODERS: Dict[int, tuple] = {code: (name, loads) for name, (code, _, loads, _) in _CODECS.items()}
+
+
+def _require(module_name: str, codec: str) -> None:
+    available = {"json": json, "msgpack": msgpack, "cbor2": cbor2}[module_name]
+    if available is None:
+        raise ImportError(
+            f"The '{codec}' payload codec requires the '{module_name}' package. Install it or use 'json'."
+        )
+
+
+# A single JSON reading is ~120 bytes, where zlib saves under 10%; a JSON
+# window summary is ~250 bytes and shrinks by about a third
+DEFAULT_COMPRESS_MIN_BYTES = 192
+
+
+class PayloadCodec:
+    """Encode payload dictionaries with the configured codec and compression.
+
+    Payloads whose encoded size reaches ``compress_min_bytes`` are zlib
+    compressed when ``compression`` is ``"zlib"``, and sent compressed only
+    if that made them smaller. With the default threshold that means
+    aggregation summaries and other large payloads; single readings are
+    left alone because compression would only add CPU time for a few bytes.
+    """
+
+    def __init__(
+        self,
+        codec: str = "json",
+        compression: Optional[str] = None,
+        compress_min_bytes: int = DEFAULT_COMPRESS_MIN_BYTES,
+    ) -> None:
+        if codec not in _CODECS:
+            raise ValueError(f"Unknown payload codec '{codec}'. Choose from: {', '.join(_CODECS)}")
+        if compression not in (None, "none", "zlib"):
+            raise ValueError(f"Unknown payload compression '{compression}'")
+        code, dumps, _loads, module_name = _CODECS[codec]
+        _require(module_name, codec)
+        self.name = codec
+        self.compression = compression if compression != "none" else None
+        self.compress_min_bytes = compress_min_bytes
+        self._code = code
+        self._dumps: Callable[[Any], bytes] = dumps
+
+    @classmethod
+    def from_config(cls, mqtt_cfg: Dict[str, Any]) -> "PayloadCodec":
+        """Build the codec described by the ``mqtt`` config section."""
+
+        return cls(
+            codec=str(mqtt_cfg.get("codec", "json")),
+            compression=mqtt_cfg.get("compression"),
+            compress_min_bytes=int(mqtt_cfg.get("compress_min_bytes", DEFAULT_COMPRESS_MIN_BYTES)),
+        )
+
+    def encode(self, payload: Any) -> bytes:
+        body = self._dumps(payload)
+        flags = 0
+        if self.compression == "zlib" and len(body) >= self.compress_min_bytes:
+            compressed = zlib.compress(body)
+            if len(compressed) < len(body):
+                body = compressed
+                flags |= FLAG_ZLIB
+        if self.name == "json" and not flags:
+            return body
+        return bytes((FRAME_MARKER, self._code, flags)) + body
+
+
+def decode_payload(data: bytes) -> Any:
+    """Decode a payload produced by any :class:`PayloadCodec` (or plain JSON).
+
+    Raises :class:`ValueError` if the payload cannot be decoded.
+    """
+
+    if not data or data[0] != FRAME_MARKER:
+        return json.loads(data)
+    if len(data) < 3:
+        raise ValueError("Truncated payload frame")
+    decoder = _DECODERS.get(data[1])
+    if decoder is None:
+        raise ValueError(f"Unknown payload codec identifier {data[1]:#x}")
+    name, loads = decoder
+    _require(_CODECS[name][3], name)
+    body = data[3:]
+    try:
+        if data[2] & FLAG_ZLIB:
+            body = zlib.decompress(body)
+        return loads(body)
+    except ValueError:
+        raise
+    except Exception as exc:  # noqa: BLE001 - codec libraries raise their own types
+        raise ValueError(f"Invalid {name} payload: {exc}") from exc
+
+
+__all__ = ["PayloadCodec", "decode_payload", "FIELD_NAMES"]
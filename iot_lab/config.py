@@ -2,11 +2,14 @@
 
 from __future__ import annotations
 
+import atexit
 import logging
 import os
 from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Optional, Tuple
+
+from .log_pipeline import LoggingPipeline, install_throttles
 
 try:  # pragma: no cover - optional dependency
     import yaml  # type: ignore
@@ -179,17 +182,43 @@ def load_config(path: str | os.PathLike[str] | None = None) -> Dict[str, Any]:
     return config
 
 
+_LOG_FORMAT = "%(asctime)s | %(levelname)-8s | %(name)s | %(message)s"
+_LOG_DATEFMT = "%Y-%m-%d %H:%M:%S"
+_PIPELINE: Optional[LoggingPipeline] = None
+
+
+def _install_pipeline(max_queue: int) -> None:
+    global _PIPELINE
+    root = logging.getLogger()
+    if _PIPELINE is not None or root.handlers:
+        # Already configured (e.g. on a Streamlit rerun) or owned by the host app
+        return
+    _PIPELINE = LoggingPipeline(logging.Formatter(_LOG_FORMAT, _LOG_DATEFMT), max_queue)
+    root.addHandler(_PIPELINE.handler)
+    _PIPELINE.start()
+    atexit.register(_PIPELINE.stop)
+
+
 def configure_logging(config: Dict[str, Any]) -> int:
-    """Configure root logging from the provided config."""
+    """Configure root logging from the provided config.
 
-    level_name = (
-        config.get("logging", {}).get("level", "INFO").upper()
-    )
+    By default records are handed to a queue and written to stderr by a
+    background thread. Loggers listed under ``logging.throttle`` are sampled
+    and/or rate limited, with a periodic summary line replacing the dropped
+    per-message records.
+    """
+
+    logging_cfg = config.get("logging", {}) or {}
+    level_name = str(logging_cfg.get("level", "INFO")).upper()
     level = getattr(logging, level_name, logging.INFO)
-    logging.basicConfig(
-        level=level,
-        format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
+    if logging_cfg.get("queue", True):
+        _install_pipeline(int(logging_cfg.get("queue_size", 10000)))
+    else:
+        logging.basicConfig(format=_LOG_FORMAT, datefmt=_LOG_DATEFMT)
+    logging.getLogger().setLevel(level)
+    install_throttles(
+        logging_cfg.get("throttle"),
+        float(logging_cfg.get("summary_interval", 10)),
     )
     logging.getLogger("paho").setLevel(logging.WARNING)
     logging.getLogger("urllib3").setLevel(logging.WARNING)
@@ -0,0 +1,229 @@
+"""Queue-based logging with per-logger sampling and rate limiting."""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+#: ``extra`` for log calls made once per message, the only records throttles drop
+PER_MESSAGE = {"per_message": True}
+
+# Seconds between checks for throttle summaries that are due
+_SUMMARY_CHECK_INTERVAL = 1.0
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue records without formatting them on the caller's thread.
+
+    :class:`logging.handlers.QueueHandler` renders every message before
+    enqueueing it. When the arguments are immutable scalars the record can be
+    rendered later by the listener thread instead, which keeps string
+    formatting off the gateway's read loop. Records with mutable arguments or
+    exception info are still prepared eagerly so they cannot change in flight.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if record.exc_info or record.stack_info or not (
+            args is None
+            or (isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args))
+        ):
+            return super().prepare(record)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Never block the hot path on a slow stderr; the record is dropped
+            pass
+
+
+class RateLimitFilter(logging.Filter):
+    """Sample and rate limit the per-message records of one logger.
+
+    Only records logged with ``extra=PER_MESSAGE`` are throttled; lifecycle
+    lines such as connects and retries, warnings and errors always pass.
+    ``sample`` keeps one record out of every N, ``rate`` caps the records
+    passed per second (token bucket with a one second burst). Every
+    ``summary_interval`` seconds a single line reports how many records the
+    logger produced, e.g. ``MQTTClient: 48213 messages in last 10s (50 logged)``,
+    in place of the suppressed per-message lines. The summary is written by
+    the next record after the interval or by :meth:`flush`, whichever comes
+    first.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: Optional[float] = None,
+        sample: int = 1,
+        summary_interval: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__()
+        self.logger_name = name
+        self.rate = rate
+        self.sample = max(1, int(sample))
+        self.summary_interval = summary_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._capacity = max(rate or 0.0, 1.0)
+        self._tokens = self._capacity
+        self._last_refill = clock()
+        self._window_start = self._last_refill
+        self._seen = 0
+        self._passed = 0
+        self._level = logging.INFO
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not getattr(record, "per_message", False):
+            return True
+        with self._lock:
+            now = self.clock()
+            self._level = record.levelno
+            self._seen += 1
+            allowed = (self._seen - 1) % self.sample == 0
+            if allowed and self.rate is not None:
+                self._tokens = min(self._capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                else:
+                    allowed = False
+            if allowed:
+                self._passed += 1
+            summary = self._close_window(now)
+        if summary:
+            self._emit_summary(*summary)
+        return allowed
+
+    def flush(self, force: bool = False) -> None:
+        """Write the summary of a finished window even if no record follows it.
+
+        With ``force`` the current window is closed early, e.g. at shutdown.
+        """
+
+        with self._lock:
+            summary = self._close_window(self.clock(), force)
+        if summary:
+            self._emit_summary(*summary)
+
+    def _close_window(self, now: float, force: bool = False) -> Optional[tuple]:
+        if not force and now - self._window_start < self.summary_interval:
+            return None
+        summary = None
+        if self._seen > self._passed:
+            summary = (self._level, self._seen, self._passed, now - self._window_start)
+        self._window_start = now
+        self._seen = 0
+        self._passed = 0
+        return summary
+
+    def _emit_summary(self, level: int, seen: int, passed: int, elapsed: float) -> None:
+        logger = logging.getLogger(self.logger_name)
+        summary = logger.makeRecord(
+            logger.name,
+            level,
+            __file__,
+            0,
+            "%s: %d messages in last %.0fs (%d logged)",
+            (self.logger_name, seen, elapsed, passed),
+            None,
+        )
+        logger.handle(summary)
+
+
+class LoggingPipeline:
+    """Own the record queue and the thread that writes it to stderr."""
+
+    def __init__(self, formatter: logging.Formatter, max_queue: int = 10000) -> None:
+        self.queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=max_queue)
+        self.handler = DeferredQueueHandler(self.queue)
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(formatter)
+        self.listener = logging.handlers.QueueListener(
+            self.queue, stream_handler, respect_handler_level=False
+        )
+
+    def start(self) -> None:
+        self.listener.start()
+
+    def stop(self) -> None:
+        """Flush queued records and stop the background writer."""
+
+        if self.listener._thread is not None:  # noqa: SLF001 - stdlib exposes no accessor
+            self.listener.stop()
+
+
+_THROTTLES: Dict[str, RateLimitFilter] = {}
+_THROTTLE_SETTINGS: Optional[tuple] = None
+_SUMMARY_THREAD: Optional[threading.Thread] = None
+_SUMMARY_STOP = threading.Event()
+
+
+def flush_throttles(force: bool = False) -> None:
+    """Write the summaries that are due; ``force`` writes every pending one."""
+
+    for rate_filter in list(_THROTTLES.values()):
+        rate_filter.flush(force)
+
+
+def _write_summaries() -> None:
+    while not _SUMMARY_STOP.wait(_SUMMARY_CHECK_INTERVAL):
+        flush_throttles()
+
+
+def _stop_summaries() -> None:
+    _SUMMARY_STOP.set()
+    flush_throttles(force=True)
+
+
+def _start_summaries() -> None:
+    global _SUMMARY_THREAD
+    if _SUMMARY_THREAD is not None:
+        return
+    _SUMMARY_THREAD = threading.Thread(target=_write_summaries, name="log-summaries", daemon=True)
+    _SUMMARY_THREAD.start()
+    # Registered after the logging pipeline, so it runs before the queue is drained
+    atexit.register(_stop_summaries)
+
+
+def install_throttles(throttles: Optional[Dict[str, Any]], summary_interval: float = 10.0) -> None:
+    """Replace the rate-limit filters attached to the named loggers.
+
+    Calling it again with the same settings keeps the existing filters, so
+    their counters survive repeated configuration (e.g. Streamlit reruns).
+    A background thread writes summaries that are due when the logger has
+    gone quiet, and pending summaries are written at exit.
+    """
+
+    global _THROTTLE_SETTINGS
+    settings = (repr(throttles), summary_interval)
+    if settings == _THROTTLE_SETTINGS:
+        return
+    _THROTTLE_SETTINGS = settings
+    for name, rate_filter in _THROTTLES.items():
+        rate_filter.flush(force=True)
+        logging.getLogger(name).removeFilter(rate_filter)
+    _THROTTLES.clear()
+    for name, options in (throttles or {}).items():
+        options = options or {}
+        rate = options.get("rate")
+        rate_filter = RateLimitFilter(
+            name,
+            rate=float(rate) if rate is not None else None,
+            sample=int(options.get("sample", 1)),
+            summary_interval=float(options.get("summary_interval", summary_interval)),
+        )
+        logging.getLogger(name).addFilter(rate_filter)
+        _THROTTLES[name] = rate_filter
+    if _THROTTLES:
+        _start_summaries()
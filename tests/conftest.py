@@ -1,6 +1,54 @@
+import json
 import sys
 from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
 
 ROOT = Path(__file__).resolve().parent.parent
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+
+class FakeClock:
+    """Callable clock that only moves when a test sets ``now``."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def make_handler():
+    """Build a dashboard handler for ``lab/device1/data``, optionally with a snapshot file."""
+
+    from dashboard.data_handler import MQTTDataHandler
+
+    def make(snapshot_path=None, **kwargs):
+        return MQTTDataHandler(
+            host="localhost",
+            port=1883,
+            data_topic="lab/device1/data",
+            snapshot_path=str(snapshot_path) if snapshot_path else None,
+            **kwargs,
+        )
+
+    return make
+
+
+@pytest.fixture
+def deliver():
+    """Hand a JSON payload to a handler as if paho had received it."""
+
+    def deliver_message(handler, payload, topic="lab/device1/data"):
+        message = SimpleNamespace(topic=topic, payload=json.dumps(payload).encode())
+        handler._on_message(None, None, message)
+
+    return deliver_message
@@ -0,0 +1,110 @@
+import json
+from unittest import mock
+
+import pytest
+
+from gateway.aggregator import WindowAggregator
+from gateway.main import GatewayController
+from gateway.message_parser import MessageParser
+from iot_lab import PayloadCodec, decode_payload
+
+
+def reading(sensor, value, device="arduino1"):
+    return {"device": device, "sensor": sensor, "value": value}
+
+
+def test_tumbling_window_summary_statistics():
+    aggregator = WindowAggregator(window=1.0)
+    for offset, value in enumerate([1, 2, 3, 4]):
+        assert aggregator.add(reading("temp", value), now=100.0 + offset * 0.1)
+    assert aggregator.collect(now=100.9) == []
+
+    (summary,) = aggregator.collect(now=101.0)
+    assert summary["sensor"] == "temp"
+    assert summary["count"] == 4
+    assert summary["min"] == 1
+    assert summary["max"] == 4
+    assert summary["mean"] == pytest.approx(2.5)
+    assert summary["stddev"] == pytest.approx(1.118033988)
+    assert summary["window_start"] == 100.0
+    assert summary["window_end"] == 101.0
+
+
+def test_silent_sensor_window_closes_and_state_is_released():
+    aggregator = WindowAggregator(window=1.0)
+    aggregator.add(reading("temp", 5), now=10.2)
+    assert len(aggregator.collect(now=500.0)) == 1
+    assert len(aggregator) == 0
+
+
+def test_sliding_windows_overlap():
+    aggregator = WindowAggregator(window=1.0, hop=0.5)
+    aggregator.add(reading("temp", 1), now=10.1)
+    aggregator.add(reading("temp", 3), now=10.6)
+    summaries = aggregator.collect(now=20.0)
+    assert [s["count"] for s in summaries] == [1, 2, 1]
+    assert [s["window_end"] for s in summaries] == [10.5, 11.0, 11.5]
+
+
+def test_non_numeric_values_are_not_aggregated():
+    aggregator = WindowAggregator(window=1.0)
+    assert not aggregator.add(reading("status", "OK"), now=1.0)
+    assert aggregator.flush() == []
+
+
+def test_controller_publishes_summaries_and_raw_stream():
+    parser = MessageParser(device_id="arduino1")
+    mqtt_client = mock.Mock()
+    clock = mock.Mock(return_value=100.2)
+    controller = GatewayController(
+        serial_reader=mock.Mock(),
+        mqtt_client=mqtt_client,
+        parser=parser,
+        publish_topic="lab/device1/data",
+        aggregator=WindowAggregator(window=1.0, clock=clock),
+        raw_topic="lab/device1/raw",
+    )
+    controller.handle_line("temp:20")
+    controller.handle_line("temp:22")
+    assert [c.args[0] for c in mqtt_client.publish.call_args_list] == ["lab/device1/raw"] * 2
+
+    clock.return_value = 101.0
+    assert controller.flush_windows() == 1
+    topic, payload = mqtt_client.publish.call_args[0][:2]
+    assert topic == "lab/device1/data"
+    assert json.loads(payload)["mean"] == 21
+
+
+def test_zlib_compresses_gateway_summaries_but_not_single_readings():
+    mqtt_client = mock.Mock()
+    clock = mock.Mock(return_value=1730738800.2)
+    controller = GatewayController(
+        serial_reader=mock.Mock(),
+        mqtt_client=mqtt_client,
+        parser=MessageParser(device_id="arduino1", clock=clock),
+        publish_topic="lab/device1/data",
+        codec=PayloadCodec.from_config({"compression": "zlib"}),
+        aggregator=WindowAggregator(window=1.0, clock=clock),
+        raw_topic="lab/device1/raw",
+    )
+    controller.handle_line("temperature:23.51")
+    controller.handle_line("temperature:23.6")
+    raw = mqtt_client.publish.call_args[0][1]
+    # A single reading is below the default threshold and stays plain JSON
+    assert raw[:1] == b"{"
+    assert len(raw) < controller.codec.compress_min_bytes
+
+    clock.return_value = 1730738801.0
+    assert controller.flush_windows() == 1
+    summary = mqtt_client.publish.call_args[0][1]
+    plain = PayloadCodec().encode(decode_payload(summary))
+    assert summary[:1] != b"{"
+    assert len(summary) < len(plain) * 0.8
+    assert decode_payload(summary)["mean"] == pytest.approx(23.555)
+
+
+def test_invalid_hop_is_rejected():
+    for hop in (0, -1.0, 2.0):
+        with pytest.raises(ValueError):
+            WindowAggregator(window=1.0, hop=hop)
+    assert WindowAggregator(window=1.0).hop == 1.0
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from iot_lab.codecs import PayloadCodec, decode_payload
+
+READING = {"device": "arduino1", "sensor": "A0", "value": 452, "timestamp": 1730738800.123456, "seq": 7, "units": "raw"}
+
+
+@pytest.mark.parametrize("codec", ["json", "msgpack", "cbor"])
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_round_trip(codec, compression):
+    pytest.importorskip({"json": "json", "msgpack": "msgpack", "cbor": "cbor2"}[codec])
+    encoder = PayloadCodec(codec, compression=compression, compress_min_bytes=0)
+    assert decode_payload(encoder.encode(READING)) == READING
+
+
+def test_plain_json_stays_unframed():
+    data = PayloadCodec("json").encode(READING)
+    assert json.loads(data) == READING
+
+
+def test_binary_codec_is_smaller_than_json():
+    pytest.importorskip("msgpack")
+    batch = {"readings": [READING] * 20}
+    assert len(PayloadCodec("msgpack").encode(READING)) < len(PayloadCodec("json").encode(READING)) / 1.5
+    assert decode_payload(PayloadCodec("msgpack").encode(batch)) == batch
+
+
+def test_small_payloads_are_not_compressed():
+    codec = PayloadCodec("json", compression="zlib", compress_min_bytes=512)
+    assert codec.encode(READING)[:1] == b"{"
+
+
+def test_invalid_payloads_raise_value_error():
+    with pytest.raises(ValueError):
+        decode_payload(b"\xc1\x7f\x00abc")
+    with pytest.raises(ValueError):
+        decode_payload(b"not json")
+    with pytest.raises(ValueError):
+        PayloadCodec("xml")
+
+
+def test_compression_is_skipped_when_it_does_not_shrink_the_payload():
+    pytest.importorskip("msgpack")
+    codec = PayloadCodec("msgpack", compression="zlib", compress_min_bytes=0)
+    plain = PayloadCodec("msgpack").encode(READING)
+    assert codec.encode(READING) == plain
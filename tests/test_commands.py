@@ -0,0 +1,93 @@
+import json
+import threading
+import time
+from unittest import mock
+
+from gateway.commands import AckTracker, CommandQueue
+from gateway.main import GatewayController
+from gateway.message_parser import MessageParser
+
+
+def build_controller(commands, acks=None):
+    serial_reader = mock.Mock()
+    serial_reader.write.return_value = True
+    mqtt_client = mock.Mock()
+    controller = GatewayController(
+        serial_reader=serial_reader,
+        mqtt_client=mqtt_client,
+        parser=MessageParser(device_id="arduino1"),
+        publish_topic="lab/device1/data",
+        commands=commands,
+        acks=acks,
+    )
+    return controller, serial_reader, mqtt_client
+
+
+def test_commands_are_written_in_order():
+    commands = CommandQueue()
+    controller, serial_reader, _ = build_controller(commands)
+    commands.put("LED=1")
+    commands.put("LED=0")
+    assert controller.service_commands() == 2
+    assert [c.args[0] for c in serial_reader.write.call_args_list] == ["LED=1", "LED=0"]
+
+
+def test_coalescing_keeps_latest_command_per_key():
+    commands = CommandQueue(coalesce=True)
+    for text in ["LED=1", "FAN=on", "LED=0"]:
+        commands.put(text)
+    assert [commands.pop().text for _ in range(len(commands))] == ["LED=0", "FAN=on"]
+    assert commands.pop() is None
+
+
+def test_queued_command_wakes_idle_loop():
+    commands = CommandQueue()
+    threading.Timer(0.05, commands.put, args=("PING",)).start()
+    started = time.monotonic()
+    assert commands.wait(5.0)
+    assert time.monotonic() - started < 1.0
+
+
+def test_ack_is_matched_and_latency_recorded(clock):
+    commands = CommandQueue(clock=clock)
+    acks = AckTracker(prefix="ACK", clock=clock)
+    controller, _, mqtt_client = build_controller(commands, acks)
+    commands.put("LED=1")
+    commands.put("FAN=on")
+    controller.service_commands()
+
+    clock.now = 0.025
+    assert controller.handle_line("ACK:FAN=on") is None
+    mqtt_client.publish.assert_not_called()
+    stats = acks.latency_stats()
+    assert stats["count"] == 1
+    assert stats["last_ms"] == 25.0
+    assert [c.text for c in acks._in_flight] == ["LED=1"]
+
+
+def test_unacknowledged_commands_expire(clock):
+    acks = AckTracker(timeout=1.0, clock=clock)
+    commands = CommandQueue(clock=clock)
+    controller, _, _ = build_controller(commands, acks)
+    commands.put("LED=1")
+    controller.service_commands()
+    clock.now = 2.0
+    controller.service_commands()
+    assert len(acks) == 0
+    assert acks.timeouts == 1
+
+
+def test_command_outcomes_are_reported_on_control_lane(clock):
+    acks = AckTracker(prefix="ACK", timeout=1.0, clock=clock)
+    commands = CommandQueue(clock=clock)
+    controller, _, mqtt_client = build_controller(commands, acks)
+    controller.ack_topic = "lab/device1/cmd/ack"
+    commands.put("LED=1")
+    commands.put("FAN=on")
+    controller.service_commands()
+    controller.handle_line("ACK:LED=1")
+    clock.now = 2.0
+    controller.service_commands()
+    reports = [json.loads(c.args[1]) for c in mqtt_client.publish.call_args_list]
+    assert [(r["command"], r["status"]) for r in reports] == [("LED=1", "ack"), ("FAN=on", "timeout")]
+    assert all(c.kwargs == {"lane": "control"} for c in mqtt_client.publish.call_args_list)
@@ -18,3 +18,16 @@ def test_load_config_without_yaml_dependency(tmp_path, monkeypatch):
     assert cfg["serial"]["port"] == "/dev/ttyUSB9"
     assert cfg["serial"]["baudrate"] == 57600
     assert cfg["mqtt"]["port"] == 1884
+
+
+def test_default_dashboard_subscription_follows_publish_topic(monkeypatch):
+    monkeypatch.delenv("IOT_LAB_CONFIG", raising=False)
+    monkeypatch.setenv("IOT_LAB_MQTT_PUB", "lab/bench2/data")
+    config_module.load_config.cache_clear()  # type: ignore[attr-defined]
+    try:
+        cfg = config_module.load_config()
+    finally:
+        config_module.load_config.cache_clear()  # type: ignore[attr-defined]
+    assert cfg["mqtt"]["publish_topic"] == "lab/bench2/data"
+    # Without explicit filters the dashboard derives '<publish_topic>/#'
+    assert not cfg["dashboard"].get("subscriptions")
@@ -0,0 +1,70 @@
+from dashboard.sequence_tracker import DUPLICATE, GAP, OK, RESET, SequenceTracker
+
+
+def test_sequence_tracker_classifies_messages():
+    tracker = SequenceTracker()
+    assert [tracker.observe("dev", seq) for seq in (0, 1, 4, 4, 2, 0)] == [
+        OK,
+        OK,
+        GAP,
+        DUPLICATE,
+        DUPLICATE,
+        RESET,
+    ]
+    stats = tracker.stats()["dev"]
+    assert stats["missing"] == 2
+    assert stats["duplicates"] == 2
+    assert stats["resets"] == 1
+
+
+def test_sequence_tracker_resets_on_new_session():
+    tracker = SequenceTracker()
+    assert [tracker.observe("dev", seq, "boot1") for seq in (0, 1, 2)] == [OK, OK, OK]
+    # The restarted gateway's first messages were lost; seq 1 is not a duplicate
+    assert tracker.observe("dev", 1, "boot2") == RESET
+    assert tracker.observe("dev", 2, "boot2") == OK
+    assert tracker.stats()["dev"]["duplicates"] == 0
+
+
+def test_gateway_restart_without_seq_zero_is_not_dropped(make_handler, deliver):
+    handler = make_handler()
+    for seq in range(100):
+        deliver(handler, {"device": "d", "sensor": "A0", "value": seq, "seq": seq})
+    # A gateway without session ids restarted and seq 0 was missed
+    for seq in (1, 2, 3):
+        deliver(handler, {"device": "d", "sensor": "A0", "value": 1000 + seq, "seq": seq})
+    stats = handler.sequences.stats()["d"]
+    assert stats["resets"] == 1
+    assert stats["duplicates"] == 0
+    assert handler.latest.get("d", "A0").value == 1003
+
+
+def test_kilohertz_stream_is_kept_intact(make_handler, deliver):
+    handler = make_handler(history_size=2000)
+    for seq in range(1000):
+        deliver(
+            handler,
+            {"device": "d", "sensor": "A0", "value": seq, "timestamp": 1700000000 + seq / 1000, "seq": seq},
+        )
+    deliver(handler, {"device": "d", "sensor": "A0", "value": 999, "timestamp": 1700000000.999, "seq": 999})
+    df = handler.to_dataframe()
+    assert len(df) == 1000
+    assert df["timestamp"].is_unique
+    assert handler.sequences.stats()["d"]["duplicates"] == 1
+
+
+def test_messages_outside_subscriptions_are_dropped(make_handler, deliver):
+    handler = make_handler(subscriptions=["lab/+/data/temp"])
+    deliver(handler, {"sensor": "temp", "value": 1}, topic="lab/device1/data/temp")
+    deliver(handler, {"sensor": "hum", "value": 1}, topic="lab/device1/data/hum")
+    assert [m["sensor"] for m in handler.latest_messages()] == ["temp"]
+
+
+def test_latest_messages_and_latest_index(make_handler, deliver):
+    handler = make_handler()
+    for value in range(5):
+        deliver(handler, {"device": "d", "sensor": "A0", "value": value})
+    deliver(handler, {"device": "d", "sensor": "A1", "value": 9})
+    assert [m["value"] for m in handler.latest_messages(3)] == [3, 4, 9]
+    assert handler.latest.get("d", "A0").value == 4
+    assert len(handler.latest) == 2
@@ -1,12 +1,14 @@
 import json
 from unittest import mock
 
+from gateway.aggregator import WindowAggregator
 from gateway.main import GatewayController
 from gateway.message_parser import MessageParser
+from gateway.sequencing import SequenceStamper
 
 
-def build_controller():
-    parser = MessageParser(device_id="arduino1")
+def build_controller(**kwargs):
+    parser = MessageParser(device_id="arduino1", clock=lambda: 1700000000.0)
     serial_reader = mock.Mock()
     mqtt_client = mock.Mock()
     controller = GatewayController(
@@ -14,14 +16,15 @@ def build_controller():
         mqtt_client=mqtt_client,
         parser=parser,
         publish_topic="lab/device1/data",
+        sequencer=SequenceStamper(session="boot1"),
+        **kwargs,
     )
     return controller, mqtt_client
 
 
 def test_handle_line_publishes_json_payload():
     controller, mqtt_client = build_controller()
-    with mock.patch("gateway.message_parser.time.time", return_value=1700000000):
-        payload = controller.handle_line("temp:26.5")
+    payload = controller.handle_line("temp:26.5")
     mqtt_client.publish.assert_called_once()
     topic, sent_payload = mqtt_client.publish.call_args[0][:2]
     assert topic == "lab/device1/data"
@@ -29,7 +32,9 @@ def test_handle_line_publishes_json_payload():
     assert body["device"] == "arduino1"
     assert body["sensor"] == "temp"
     assert body["value"] == 26.5
-    assert body["timestamp"] == 1700000000
+    assert body["timestamp"] == 1700000000.0
+    assert body["seq"] == 0
+    assert body["session"] == "boot1"
     assert payload == sent_payload
 
 
@@ -38,3 +43,48 @@ def test_handle_line_ignores_empty_messages():
     result = controller.handle_line("")
     assert result is None
     mqtt_client.publish.assert_not_called()
+
+
+def test_per_sensor_topics_fan_out_and_are_cached():
+    controller, mqtt_client = build_controller()
+    controller.per_sensor_topics = True
+    controller.handle_line("temp:26.5")
+    controller.handle_line("temp:26.6")
+    controller.handle_line("a/b:1")
+    topics = [c.args[0] for c in mqtt_client.publish.call_args_list]
+    assert topics == ["lab/device1/data/temp", "lab/device1/data/temp", "lab/device1/data/a_b"]
+    assert topics[0] is topics[1]
+
+
+def test_seq_counts_published_messages_only():
+    controller, mqtt_client = build_controller(
+        aggregator=WindowAggregator(window=1.0, clock=lambda: 1700000000.0), raw_topic="lab/device1/raw"
+    )
+    controller.handle_line('{"sensor": "temp", "value": 1, "seq": 50}')
+    controller.handle_line("status:ok")
+    controller.handle_line("temp:2")
+    controller.flush_windows(final=True)
+    sent = [(c.args[0], json.loads(c.args[1])) for c in mqtt_client.publish.call_args_list]
+    data = [body for topic, body in sent if topic == "lab/device1/data"]
+    raw = [body for topic, body in sent if topic == "lab/device1/raw"]
+    # The forwarded text reading and the summary are numbered without holes
+    assert [(body["sensor"], body["seq"]) for body in data] == [("status", 0), ("temp", 1)]
+    assert all(body["session"] == "boot1" for body in data)
+    assert all("seq" not in body for body in raw)
+    assert raw[0]["device_seq"] == 50
+
+
+def test_aggregated_readings_are_encoded_only_for_the_raw_stream():
+    controller, mqtt_client = build_controller(
+        aggregator=WindowAggregator(window=1.0, clock=lambda: 1700000000.0)
+    )
+    controller.codec = mock.Mock(wraps=controller.codec)
+    # Only added to the window: nothing is encoded or published
+    assert controller.handle_line("temp:2") is None
+    controller.codec.encode.assert_not_called()
+    mqtt_client.publish.assert_not_called()
+
+    controller.raw_topic = "lab/device1/raw"
+    assert controller.handle_line("temp:3") is None
+    assert controller.codec.encode.call_count == 1
+    assert mqtt_client.publish.call_args[0][0] == "lab/device1/raw"
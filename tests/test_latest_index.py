@@ -0,0 +1,29 @@
+import pytest
+
+from dashboard.latest_index import LatestValueIndex
+
+
+def test_latest_value_rate_and_staleness(clock):
+    clock.now = 100.0
+    index = LatestValueIndex(alpha=0.5, clock=clock)
+    for value in (1, 2, 3):
+        index.update({"device": "d1", "sensor": "temp", "value": value, "timestamp": clock.now})
+        clock.now += 0.1
+    clock.now += 1.0
+    (entry,) = index.snapshot()
+    assert entry["value"] == 3
+    assert entry["count"] == 3
+    assert entry["rate"] == pytest.approx(10.0)
+    assert entry["staleness"] == pytest.approx(1.1)
+
+
+def test_most_recent_orders_by_arrival_across_many_sensors(clock):
+    index = LatestValueIndex(clock=clock)
+    for device in range(20):
+        for sensor in range(20):
+            clock.now += 1
+            index.update({"device": f"d{device}", "sensor": f"s{sensor}", "value": sensor})
+    assert len(index) == 400
+    recent = index.most_recent(3)
+    assert [(e["device"], e["sensor"]) for e in recent] == [("d19", "s19"), ("d19", "s18"), ("d19", "s17")]
+    assert index.get("d0", "s0").value == 0
@@ -0,0 +1,84 @@
+import pandas as pd
+
+from dashboard.live_frame import LiveFrame, chart_frame
+from dashboard.retention import RetainedBuffer
+
+
+def reading(seq, sensor="a"):
+    return {"device": "d", "sensor": sensor, "value": float(seq), "timestamp": 1700000000 + seq}
+
+
+def full_rebuild(buffer):
+    return chart_frame(pd.DataFrame(buffer.records()))
+
+
+def assert_matches_buffer(live_frame, buffer):
+    assert len(live_frame) == len(buffer)
+    # Sensors keep their column position as others come and go
+    pd.testing.assert_frame_equal(
+        live_frame.chart(), full_rebuild(buffer), check_freq=False, check_like=True
+    )
+
+
+def test_refresh_applies_only_new_messages():
+    buffer = RetainedBuffer()
+    live_frame = LiveFrame()
+    for seq in range(10):
+        buffer.append(reading(seq, "a" if seq % 2 else "b"))
+    assert live_frame.refresh(buffer)
+    live_frame.chart()
+    for seq in range(10, 15):
+        buffer.append(reading(seq, "a" if seq % 2 else "b"))
+    assert live_frame.refresh(buffer)
+    assert_matches_buffer(live_frame, buffer)
+    # Nothing new: the chart is left untouched
+    chart = live_frame.chart()
+    assert not live_frame.refresh(buffer)
+    assert live_frame.chart() is chart
+
+
+def test_refresh_follows_global_and_per_sensor_eviction():
+    buffer = RetainedBuffer(max_samples=8, per_sensor=3)
+    live_frame = LiveFrame(per_sensor=3)
+    buffer.append(reading(0, "slow"))
+    for seq in range(1, 6):
+        buffer.append(reading(seq, "fast"))
+    live_frame.refresh(buffer)
+    live_frame.chart()
+    for seq in range(6, 12):
+        buffer.append(reading(seq, "other" if seq % 2 else "fast"))
+        live_frame.refresh(buffer)
+        assert_matches_buffer(live_frame, buffer)
+
+
+def test_clear_resets_the_frame():
+    buffer = RetainedBuffer()
+    live_frame = LiveFrame()
+    buffer.append(reading(0))
+    live_frame.refresh(buffer)
+    buffer.clear()
+    buffer.append(reading(1))
+    assert live_frame.refresh(buffer)
+    assert len(live_frame) == 1
+    assert list(live_frame.chart()["a"]) == [1.0]
+
+
+def test_chart_merges_devices_and_skips_text_values():
+    buffer = RetainedBuffer(per_sensor=3)
+    live_frame = LiveFrame(per_sensor=3)
+    for seq in range(200):
+        buffer.append({**reading(seq // 2, "a"), "device": f"d{seq % 2}"})
+        if seq % 7 == 0:
+            buffer.append({"device": "d0", "sensor": "a", "value": "offline", "timestamp": 1700000000.5 + seq})
+        live_frame.refresh(buffer)
+        assert_matches_buffer(live_frame, buffer)
+
+
+def test_long_run_matches_full_rebuild():
+    buffer = RetainedBuffer(max_samples=500, per_sensor=300)
+    live_frame = LiveFrame(per_sensor=300)
+    for seq in range(3000):
+        buffer.append(reading(seq, "abc"[seq % 5 % 3]))
+        if seq % 37 == 0:
+            live_frame.refresh(buffer)
+            assert_matches_buffer(live_frame, buffer)
@@ -0,0 +1,119 @@
+import logging
+import queue
+
+import iot_lab.log_pipeline as log_pipeline
+from iot_lab.log_pipeline import PER_MESSAGE, DeferredQueueHandler, RateLimitFilter
+
+
+def make_record(msg="Published to %s: %s", args=("topic", "payload"), level=logging.INFO):
+    record = logging.LogRecord("MQTTClient", level, __file__, 1, msg, args, None)
+    record.per_message = True
+    return record
+
+
+def capture(name):
+    logger = logging.getLogger(name)
+    captured = []
+    handler = logging.Handler()
+    handler.emit = captured.append
+    logger.addHandler(handler)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger, handler, captured
+
+
+def test_sampling_keeps_one_in_n():
+    rate_filter = RateLimitFilter("MQTTClient", sample=10, summary_interval=1e9)
+    passed = sum(rate_filter.filter(make_record()) for _ in range(100))
+    assert passed == 10
+
+
+def test_rate_limit_and_summary_line(clock):
+    logger, handler, captured = capture("test.rate_limited")
+    try:
+        rate_filter = RateLimitFilter(logger.name, rate=2, summary_interval=10, clock=clock)
+        logger.addFilter(rate_filter)
+        for _ in range(50):
+            logger.info("Published to %s", "topic", extra=PER_MESSAGE)
+        assert len(captured) == 2
+
+        clock.now = 10.0
+        logger.info("Published to %s", "topic", extra=PER_MESSAGE)
+        summary = captured[-2].getMessage()
+        assert summary == "test.rate_limited: 51 messages in last 10s (3 logged)"
+        logger.warning("warnings always pass")
+        assert captured[-1].getMessage() == "warnings always pass"
+    finally:
+        logger.removeHandler(handler)
+        logger.filters.clear()
+
+
+def test_deferred_handler_skips_formatting_for_immutable_args():
+    records = queue.Queue()
+    handler = DeferredQueueHandler(records)
+    handler.handle(make_record())
+    queued = records.get_nowait()
+    assert queued.msg == "Published to %s: %s"
+    assert queued.getMessage() == "Published to topic: payload"
+
+    handler.handle(make_record(msg="Parsed payload: %s", args=({"value": 1},)))
+    assert records.get_nowait().msg == "Parsed payload: {'value': 1}"
+
+
+def test_lifecycle_lines_are_never_throttled(clock):
+    logger, handler, captured = capture("test.lifecycle")
+    try:
+        logger.addFilter(RateLimitFilter(logger.name, rate=1, sample=100, clock=clock))
+        for _ in range(5):
+            logger.info("Published to %s", "topic", extra=PER_MESSAGE)
+        logger.info("Connected to MQTT broker at %s:%s", "broker", 1883)
+        assert [record.getMessage() for record in captured] == [
+            "Published to topic",
+            "Connected to MQTT broker at broker:1883",
+        ]
+    finally:
+        logger.removeHandler(handler)
+        logger.filters.clear()
+
+
+def test_pending_summary_is_written_without_a_later_record(clock):
+    logger, handler, captured = capture("test.quiet")
+    try:
+        rate_filter = RateLimitFilter(logger.name, sample=10, summary_interval=10, clock=clock)
+        logger.addFilter(rate_filter)
+        for _ in range(25):
+            logger.info("Published to %s", "topic", extra=PER_MESSAGE)
+        rate_filter.flush()
+        assert len(captured) == 3
+
+        # The logger went quiet; the timer writes the summary once the window ends
+        clock.now = 12.0
+        rate_filter.flush()
+        assert captured[-1].getMessage() == "test.quiet: 25 messages in last 12s (3 logged)"
+        rate_filter.flush()
+        assert len(captured) == 4
+
+        # At shutdown the unfinished window is reported too
+        for _ in range(5):
+            logger.info("Published to %s", "topic", extra=PER_MESSAGE)
+        clock.now = 15.0
+        rate_filter.flush(force=True)
+        assert captured[-1].getMessage() == "test.quiet: 5 messages in last 3s (1 logged)"
+    finally:
+        logger.removeHandler(handler)
+        logger.filters.clear()
+
+
+def test_installed_throttles_flush_on_shutdown(monkeypatch):
+    logger, handler, captured = capture("test.installed")
+    monkeypatch.setattr(log_pipeline, "_start_summaries", lambda: None)
+    try:
+        log_pipeline.install_throttles({logger.name: {"sample": 100}})
+        for _ in range(10):
+            logger.info("Published to %s", "topic", extra=PER_MESSAGE)
+        log_pipeline.flush_throttles(force=True)
+        assert captured[-1].getMessage().startswith("test.installed: 10 messages in last")
+    finally:
+        log_pipeline.install_throttles(None)
+        logger.removeHandler(handler)
+    assert logger.filters == []
@@ -1,32 +1,93 @@
 import json
-from unittest import mock
+
+import pytest
 
 from gateway.message_parser import MessageParser
+from gateway.timing import AnchoredClock, ClockOffsetEstimator
 
 
 def test_parse_key_value_line():
-    parser = MessageParser(device_id="device")
-    with mock.patch("gateway.message_parser.time.time", return_value=1700000000):
-        payload = parser.parse("A0:123")
+    parser = MessageParser(device_id="device", clock=lambda: 1700000000.0)
+    payload = parser.parse("A0:123")
     assert payload == {
         "device": "device",
         "sensor": "A0",
         "value": 123,
-        "timestamp": 1700000000,
+        "timestamp": 1700000000.0,
     }
 
 
 def test_parse_json_line_preserves_fields():
-    parser = MessageParser(device_id="device")
+    parser = MessageParser(device_id="device", clock=lambda: 1700000000.0)
     data = {"sensor": "temp", "value": "24.5"}
-    with mock.patch("gateway.message_parser.time.time", return_value=1700000000):
-        payload = parser.parse(json.dumps(data))
+    payload = parser.parse(json.dumps(data))
     assert payload["device"] == "device"
     assert payload["sensor"] == "temp"
     assert payload["value"] == 24.5
-    assert payload["timestamp"] == 1700000000
+    assert payload["timestamp"] == 1700000000.0
+
+
+def test_device_seq_does_not_take_the_gateway_seq():
+    parser = MessageParser(device_id="device", clock=lambda: 1700000000.0)
+    payload = parser.parse(json.dumps({"sensor": "temp", "value": 1, "seq": 917}))
+    assert "seq" not in payload
+    assert payload["device_seq"] == 917
 
 
 def test_parse_empty_line_returns_none():
     parser = MessageParser(device_id="device")
     assert parser.parse("") is None
+
+
+def test_timestamps_resolve_sub_millisecond_readings():
+    ticks = iter([1700000000.0001, 1700000000.0002, 1700000000.0003])
+    parser = MessageParser(device_id="device", clock=lambda: next(ticks))
+    payloads = [parser.parse(f"A0:{i}") for i in range(3)]
+    assert [p["timestamp"] for p in payloads] == [1700000000.0001, 1700000000.0002, 1700000000.0003]
+
+
+def test_anchored_clock_is_monotonic_and_high_resolution():
+    clock = AnchoredClock()
+    readings = [clock() for _ in range(1000)]
+    assert readings == sorted(readings)
+    assert readings[-1] != readings[0]
+
+
+def test_device_timestamps_are_corrected_by_offset_estimate():
+    host = iter([1000.050, 1000.110, 1000.150])
+    parser = MessageParser(
+        device_id="device",
+        clock=lambda: next(host),
+        device_time_key="ms",
+        device_time_scale=0.001,
+    )
+    # Device clock runs 900 s behind the host; transport delay varies 10-50 ms
+    stamps = [
+        parser.parse(json.dumps({"sensor": "A0", "value": 1, "ms": ms}))["timestamp"]
+        for ms in (100000, 100100, 100140)
+    ]
+    assert stamps == pytest.approx([1000.050, 1000.110, 1000.150])
+    estimator = parser._offsets["device"]
+    assert estimator.offset == pytest.approx(900.010)
+
+
+def test_offset_estimator_window_follows_drift():
+    estimator = ClockOffsetEstimator(window=2)
+    estimator.update(10.0, 5.0)
+    estimator.update(11.0, 7.0)
+    assert estimator.offset == 4.0
+    estimator.update(12.0, 7.5)
+    assert estimator.offset == 4.0
+    estimator.update(13.0, 8.0)
+    assert estimator.offset == 4.5
+
+
+def test_offset_estimator_restarts_after_device_clock_reset():
+    estimator = ClockOffsetEstimator(window=256, reset_threshold=1.0)
+    for step in range(10):
+        estimator.update(1000.0 + step, 100.0 + step)
+    assert estimator.offset == 900.0
+    # The board rebooted: its clock starts again from zero
+    assert estimator.update(1010.0, 0.0) == 1010.0
+    assert estimator.update(1011.0, 1.0) == 1010.0
+    assert estimator.resets == 1
@@ -0,0 +1,150 @@
+import socket
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+from unittest import mock
+
+import paho.mqtt.client as mqtt
+import pytest
+
+from gateway.mqtt_client import MQTTClient
+
+
+class SlowNetwork:
+    """Stand-in for the paho client whose socket sends one packet per ``per_packet`` seconds.
+
+    Like paho, published packets wait in one first-in first-out queue until
+    the network loop writes them. The socket is one end of a socket pair, so
+    it can be selected on and is always writable.
+    """
+
+    def __init__(self, per_packet):
+        self.per_packet = per_packet
+        self.out = deque()
+        self.wire = []
+        self.lock = threading.Lock()
+        self.on_connect = None
+        self.sock = None
+        self.callers = set()
+
+    def connect(self, *_args, **_kwargs):
+        self.sock, self.peer = socket.socketpair()
+        self.on_connect(self, None, None, 0)
+
+    def socket(self):
+        return self.sock
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.callers.add(threading.current_thread().name)
+        with self.lock:
+            self.out.append((topic, payload))
+        return SimpleNamespace(rc=mqtt.MQTT_ERR_SUCCESS)
+
+    def want_write(self):
+        return bool(self.out)
+
+    def loop_read(self):
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def loop_write(self):
+        time.sleep(self.per_packet)
+        with self.lock:
+            if self.out:
+                topic, payload = self.out.popleft()
+                self.wire.append((topic, payload, time.monotonic()))
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def loop_misc(self):
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def disconnect(self):
+        self.sock.close()
+        self.peer.close()
+        self.sock = None
+
+
+def connected_client(per_packet=0.0005):
+    client = MQTTClient(host="broker", port=1883, max_pending=100000)
+    network = SlowNetwork(per_packet)
+    network.on_connect = client._on_connect
+    client.client = network
+    assert client.connect(timeout=1)
+    return client, network
+
+
+def test_command_latency_under_saturated_telemetry():
+    client, network = connected_client()
+    try:
+        # Two and a half seconds of backlog at the simulated link speed
+        for index in range(5000):
+            client.publish("lab/device1/data", f"reading{index}")
+        time.sleep(0.05)
+        started = time.monotonic()
+        client.publish("lab/device1/cmd/ack", "LED=1", lane="control")
+        deadline = started + 2
+        while time.monotonic() < deadline:
+            sent = [entry for entry in list(network.wire) if entry[0] == "lab/device1/cmd/ack"]
+            if sent:
+                break
+            time.sleep(0.001)
+        assert sent, "control message never reached the wire"
+        latency = sent[0][2] - started
+        telemetry_sent = sum(1 for entry in network.wire if entry[0] == "lab/device1/data")
+        assert latency < client.lanes["control"].latency_budget
+        # Telemetry was still saturated when the command overtook it
+        assert telemetry_sent < 2500
+        assert client.lanes["control"].over_budget == 0
+        # Only the network thread calls paho
+        assert network.callers == {"mqtt-network"}
+    finally:
+        client.stop(flush_timeout=0)
+
+
+def test_stop_flushes_lanes_and_reports_what_was_dropped():
+    client, network = connected_client(per_packet=0.0001)
+    for index in range(200):
+        client.publish("lab/device1/data", f"reading{index}")
+    assert client.stop(flush_timeout=5) == 0
+    assert len(network.wire) == 200
+    assert network.sock is None
+
+    client, network = connected_client(per_packet=0.01)
+    for index in range(200):
+        client.publish("lab/device1/data", f"reading{index}")
+    dropped = client.stop(flush_timeout=0.1)
+    assert 0 < dropped < 200
+    assert len(network.wire) + len(network.out) + dropped == 200
+
+
+def test_blocking_publish_waits_for_room_instead_of_dropping():
+    client, network = connected_client(per_packet=0.0002)
+    client.lanes["telemetry"].max_pending = 10
+    for index in range(300):
+        client.publish("lab/device1/data", f"reading{index}", block=True)
+        assert len(client.lanes["telemetry"]) <= 10
+    assert client.stop(flush_timeout=5) == 0
+    assert [entry[1] for entry in network.wire] == [f"reading{index}" for index in range(300)]
+
+
+def test_lanes_drain_by_priority_after_reconnect():
+    client = MQTTClient(host="broker", port=1883)
+    client.client = mock.Mock()
+    client.client.want_write.return_value = False
+    client.client.publish.return_value = mock.Mock(rc=mqtt.MQTT_ERR_SUCCESS)
+    client._thread = mock.Mock()
+    assert client.publish("data", "t1") is False
+    assert client.publish("alerts", "a1", lane="alerts") is False
+    assert client.publish("cmd", "c1", lane="control") is False
+    client._on_connect(client.client, None, None, 0)
+    calls = client.client.publish.call_args_list
+    assert [(c.args[1], c.kwargs["qos"]) for c in calls] == [("c1", 1), ("a1", 1), ("t1", 0)]
+    assert client.lane_stats()["control"]["sent"] == 1
+
+
+def test_unknown_lane_is_rejected():
+    client = MQTTClient(host="broker", port=1883)
+    with pytest.raises(ValueError):
+        client.publish("topic", "payload", lane="bulk")
+    with pytest.raises(ValueError):
+        MQTTClient(host="broker", port=1883, lanes={"bulk": {"qos": 0}})
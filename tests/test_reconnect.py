@@ -0,0 +1,102 @@
+import time
+from unittest import mock
+
+import paho.mqtt.client as mqtt
+
+import gateway.serial_reader as serial_reader_module
+from gateway.backoff import Backoff
+from gateway.mqtt_client import MQTTClient
+from gateway.serial_reader import SerialException, SerialReader
+
+
+def test_backoff_grows_exponentially_with_jitter_and_resets():
+    backoff = Backoff(initial=1.0, maximum=8.0, rng=lambda: 1.0)
+    assert [backoff.next_delay() for _ in range(5)] == [1.0, 2.0, 4.0, 8.0, 8.0]
+    backoff.reset()
+    low = Backoff(initial=1.0, maximum=8.0, rng=lambda: 0.0)
+    assert [low.next_delay() for _ in range(3)] == [0.5, 1.0, 2.0]
+
+
+def make_client():
+    client = MQTTClient(host="broker", port=1883, max_pending=3)
+    client.client = mock.Mock()
+    client.client.want_write.return_value = False
+    client._thread = mock.Mock()  # pretend the network thread is running
+    return client
+
+
+def test_publish_while_offline_buffers_without_blocking():
+    client = make_client()
+    started = time.monotonic()
+    for index in range(5):
+        assert client.publish("topic", f"msg{index}") is False
+    assert time.monotonic() - started < 0.1
+    assert [message[2] for message in client.lanes["telemetry"].queue] == ["msg2", "msg3", "msg4"]
+    assert client.dropped == 2
+    client.client.publish.assert_not_called()
+
+
+def test_buffer_is_flushed_in_order_on_connect():
+    client = make_client()
+    client.client.publish.return_value = mock.Mock(rc=mqtt.MQTT_ERR_SUCCESS)
+    client.publish("topic", "first")
+    client.publish("topic", "second")
+    client._on_connect(client.client, None, None, 0)
+    assert client.publish("topic", "third") is True
+    # Queued for the network thread, which sends it on its next pass
+    assert [call.args[1] for call in client.client.publish.call_args_list] == ["first", "second"]
+    with client._lock:
+        client._drain()
+    sent = [call.args[1] for call in client.client.publish.call_args_list]
+    assert sent == ["first", "second", "third"]
+
+
+def flaky_serial(failures):
+    """Fake ``serial.Serial`` whose first ``failures`` opens fail; counts opens per test."""
+
+    class FlakySerial:
+        opened = 0
+
+        def __init__(self, *_args, **_kwargs):
+            FlakySerial.opened += 1
+            if FlakySerial.opened <= failures:
+                raise SerialException("port busy")
+            self.is_open = True
+
+        def readline(self):
+            return b"A0:1\n"
+
+        def close(self):
+            self.is_open = False
+
+    return FlakySerial
+
+
+def test_serial_reconnects_in_background(monkeypatch):
+    fake_serial = mock.Mock(Serial=flaky_serial(failures=1))
+    monkeypatch.setattr(serial_reader_module, "serial", fake_serial)
+    reader = SerialReader(port="/dev/null", baudrate=9600, reconnect_interval=0.02)
+    started = time.monotonic()
+    assert reader.read_line() is None
+    assert time.monotonic() - started < 0.1
+
+    deadline = time.monotonic() + 2
+    while not reader.is_connected and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert reader.read_line() == "A0:1"
+    reader.close()
+
+
+def test_closed_serial_reader_stays_closed(monkeypatch):
+    serial_class = flaky_serial(failures=0)
+    fake_serial = mock.Mock(Serial=serial_class)
+    monkeypatch.setattr(serial_reader_module, "serial", fake_serial)
+    reader = SerialReader(port="/dev/null", baudrate=9600)
+    assert reader.read_line() == "A0:1"
+    reader.close()
+    assert reader.read_line() is None
+    assert reader.write("LED=1") is False
+    assert serial_class.opened == 1
+    assert reader.reopen()
+    assert reader.read_line() == "A0:1"
+    reader.close()
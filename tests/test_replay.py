@@ -0,0 +1,149 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from dashboard.snapshots import save_snapshot
+from gateway.replay import Replayer, read_capture
+from iot_lab import PayloadCodec, decode_payload
+
+
+class FakeTime:
+    """Clock whose ``sleep`` advances it; ``cost`` is added per publish."""
+
+    def __init__(self, cost=0.0):
+        self.now = 100.0
+        self.cost = cost
+        self.sleeps = []
+        self.published = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+    def publish(self, topic, payload):
+        self.now += self.cost
+        self.published.append((topic, decode_payload(payload)))
+        return True
+
+
+def make_replayer(fake, **kwargs):
+    return Replayer(
+        publish=fake.publish,
+        topic="lab/replay",
+        clock=fake.clock,
+        sleep=fake.sleep,
+        wall_clock=lambda: 5000.0,
+        **kwargs,
+    )
+
+
+MESSAGES = [
+    {"sensor": "a", "value": 1, "timestamp": 10.0, "topic": "lab/device1/data"},
+    {"sensor": "a", "value": 2, "timestamp": 11.0, "topic": "lab/device1/data"},
+    {"sensor": "b", "value": 3, "timestamp": 13.0},
+]
+
+
+def test_replay_keeps_recorded_timing_and_topics():
+    fake = FakeTime()
+    stats = make_replayer(fake).run(MESSAGES)
+    assert fake.sleeps == [1.0, 2.0]
+    assert [topic for topic, _ in fake.published] == ["lab/device1/data", "lab/device1/data", "lab/replay"]
+    first = fake.published[0][1]
+    assert {key: first[key] for key in ("sensor", "value", "timestamp")} == {
+        "sensor": "a",
+        "value": 1,
+        "timestamp": 10.0,
+    }
+    assert [payload["seq"] for _, payload in fake.published] == [0, 1, 2]
+    assert first["session"].startswith("replay-")
+    assert stats.messages == 3 and stats.span == 3.0 and stats.elapsed == 3.0
+    assert stats.max_lag == 0
+
+
+def test_replay_speed_and_as_fast_as_possible():
+    fake = FakeTime()
+    make_replayer(fake, speed=10).run(MESSAGES)
+    assert fake.sleeps == [0.1, 0.2]
+    fake = FakeTime()
+    make_replayer(fake, speed=0, rebase_timestamps=True).run(MESSAGES)
+    assert fake.sleeps == []
+    assert [payload["timestamp"] for _, payload in fake.published] == [5000.0] * 3
+
+
+def test_replay_reports_lag_when_publishing_falls_behind():
+    fake = FakeTime(cost=0.5)
+    stats = make_replayer(fake, speed=4).run(MESSAGES)
+    # Due at 0, 0.25 and 0.75s; each publish takes 0.5s
+    assert stats.late == 3
+    assert stats.max_lag == pytest.approx(0.75)
+    assert stats.rate == pytest.approx(3 / 1.5)
+
+
+def test_replay_reaches_a_dashboard_that_saw_the_recording(make_handler):
+    handler = make_handler()
+
+    def deliver(topic, payload):
+        handler._on_message(None, None, SimpleNamespace(topic=topic, payload=payload))
+        return True
+
+    recorded = [
+        {"device": "d", "sensor": "a", "value": seq, "timestamp": 10.0 + seq, "seq": seq, "session": "boot1"}
+        for seq in range(5)
+    ]
+    codec = PayloadCodec()
+    for message in recorded:
+        deliver("lab/device1/data", codec.encode(message))
+    fake = FakeTime()
+    Replayer(publish=deliver, topic="lab/device1/data", speed=0, clock=fake.clock, sleep=fake.sleep).run(
+        dict(message, topic="lab/device1/data") for message in recorded
+    )
+    assert list(handler.to_dataframe()["value"]) == [0, 1, 2, 3, 4] * 2
+    stats = handler.sequences.stats()["d"]
+    assert stats["duplicates"] == 0
+    assert stats["resets"] == 1
+
+
+def test_read_capture_streams_each_format(tmp_path):
+    jsonl = tmp_path / "capture.jsonl"
+    jsonl.write_text("\n".join(json.dumps(message) for message in MESSAGES) + "\nnot json\n")
+    assert list(read_capture(jsonl)) == MESSAGES
+
+    csv_path = tmp_path / "capture.csv"
+    csv_path.write_text("timestamp,sensor,value,topic,seq\n10.5,a,1,lab/x,0\n11.5,raw,hello,lab/x,\n")
+    assert list(read_capture(csv_path)) == [
+        {"timestamp": 10.5, "sensor": "a", "value": 1, "topic": "lab/x", "seq": 0},
+        {"timestamp": 11.5, "sensor": "raw", "value": "hello", "topic": "lab/x"},
+    ]
+
+    document = tmp_path / "capture.json"
+    document.write_text(json.dumps(MESSAGES, indent=2))
+    assert list(read_capture(document)) == MESSAGES
+
+    records = [(1.0, {"device": "d", "sensor": "a", "value": 2.5, "timestamp": 12.0, "topic": "lab/x"})]
+    snapshot = save_snapshot(tmp_path / "state.snapshot", records, [], {})
+    assert list(read_capture(snapshot)) == [records[0][1]]
+
+    with pytest.raises(ValueError):
+        read_capture(tmp_path / "capture.txt")
+
+
+def test_replay_summary_reports_undelivered_messages():
+    fake = FakeTime()
+    stats = make_replayer(fake, speed=0).run(MESSAGES)
+    stats.dropped = 1
+    assert stats.published == 2
+    assert "1 dropped" in stats.summary()
+
+
+def test_replay_rate_counts_messages_the_client_sent():
+    fake = FakeTime(cost=0.5)
+    # The client has sent one message by the end; two are still queued
+    stats = make_replayer(fake, speed=0, sent=lambda: 1).run(MESSAGES)
+    assert stats.messages == 3 and stats.published == 1
+    assert stats.rate == pytest.approx(1 / 1.5)
+    assert stats.summary().startswith("1 of 3 messages sent in 1.50s (1 msg/s")
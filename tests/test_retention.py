@@ -0,0 +1,64 @@
+from dashboard.retention import RetainedBuffer
+
+
+def reading(sensor, value):
+    return {"device": "d", "sensor": sensor, "value": value}
+
+
+def test_per_sensor_limit_protects_slow_sensors():
+    buffer = RetainedBuffer(per_sensor=3)
+    buffer.append(reading("slow", 0))
+    for value in range(5000):
+        buffer.append(reading("fast", value))
+    records = buffer.records()
+    assert len(buffer) == 4
+    assert [r["value"] for r in records] == [0, 4997, 4998, 4999]
+    # Dead entries are compacted instead of accumulating
+    assert len(buffer._entries) < 2100
+
+
+def test_max_age_evicts_on_append_and_read(clock):
+    buffer = RetainedBuffer(max_age=10, clock=clock)
+    buffer.append(reading("a", 1))
+    clock.now = 5
+    buffer.append(reading("a", 2))
+    clock.now = 12
+    assert [r["value"] for r in buffer] == [2]
+    clock.now = 30
+    assert not buffer.records()
+    assert buffer.memory_usage == 0
+
+
+def test_max_samples_and_memory_budget():
+    buffer = RetainedBuffer(max_samples=10)
+    for value in range(25):
+        buffer.append(reading("a", value))
+    assert [r["value"] for r in buffer] == list(range(15, 25))
+
+    sized = RetainedBuffer(max_bytes=2000)
+    for value in range(100):
+        sized.append(reading("a", value))
+    assert 0 < sized.memory_usage <= 2000
+    assert sized.records()[-1]["value"] == 99
+    assert len(sized) < 100
+
+
+def test_mixed_eviction_keeps_sensor_indexes_consistent():
+    buffer = RetainedBuffer(max_samples=5, per_sensor=2)
+    for value in range(20):
+        buffer.append(reading("a" if value % 3 else "b", value))
+    assert len(buffer) == len(buffer.records()) == 4
+    assert sum(len(entries) for entries in buffer._by_sensor.values()) == 4
+    assert list(reversed(buffer))[0]["value"] == 19
+
+
+def test_dead_entries_release_their_records():
+    buffer = RetainedBuffer(per_sensor=2)
+    for value in range(10):
+        buffer.append(reading("a", value))
+    dead = [entry for entry in buffer._entries if not entry.alive]
+    assert len(dead) == 8
+    assert all(entry.record is None for entry in dead)
+    assert buffer.memory_usage == sum(entry.size for entry in buffer._entries if entry.alive)
+    assert [r["value"] for r in buffer.newest(3)] == [9, 8]
+    assert [r["value"] for r in buffer.newest(1)] == [9]
@@ -0,0 +1,82 @@
+from unittest import mock
+
+import pytest
+
+from gateway.main import GatewayController
+from gateway.message_parser import MessageParser
+from gateway.rules import Rule, RuleEngine
+
+
+def reading(value, timestamp, sensor="temp", device="d"):
+    return {"device": device, "sensor": sensor, "value": value, "timestamp": timestamp}
+
+
+def states(alerts):
+    return [(alert["rule"], alert["state"]) for alert in alerts]
+
+
+def test_threshold_with_hysteresis_does_not_flap():
+    engine = RuleEngine([Rule("hot", sensor="temp", above=30, hysteresis=1)])
+    results = [states(engine.evaluate(reading(value, t))) for t, value in enumerate([29, 31, 29.5, 30.5, 28.9, 31])]
+    assert results == [[], [("hot", "active")], [], [], [("hot", "cleared")], [("hot", "active")]]
+
+
+def test_below_limit_and_device_filter():
+    engine = RuleEngine([Rule("cold", sensor="temp", device="d", below=5)])
+    assert states(engine.evaluate(reading(4, 0, device="other"))) == []
+    alerts = engine.evaluate(reading(4, 0))
+    assert states(alerts) == [("cold", "active")]
+    assert alerts[0]["condition"] == "below" and alerts[0]["signal"] == 4 and alerts[0]["limit"] == 5
+
+
+def test_rate_of_change_uses_reading_timestamps():
+    engine = RuleEngine([Rule("jump", kind="rate", sensor="temp", above=2, below=-2)])
+    assert engine.evaluate(reading(10, 0.0)) == []
+    assert engine.evaluate(reading(11, 1.0)) == []
+    alerts = engine.evaluate(reading(15, 2.0))
+    assert states(alerts) == [("jump", "active")] and alerts[0]["signal"] == 4
+    assert states(engine.evaluate(reading(15, 3.0))) == [("jump", "cleared")]
+    assert states(engine.evaluate(reading(5, 4.0))) == [("jump", "active")]
+
+
+def test_stuck_value_alerts_after_duration():
+    engine = RuleEngine([Rule("stuck", kind="stuck", sensor="temp", duration=10, tolerance=0.1)])
+    results = [states(engine.evaluate(reading(value, t))) for t, value in [(0, 5), (6, 5.05), (11, 5), (12, 6)]]
+    assert results == [[], [], [("stuck", "active")], [("stuck", "cleared")]]
+
+
+def test_many_rules_only_report_changes():
+    rules = [Rule(f"r{limit}", sensor="temp", above=limit) for limit in range(1000)]
+    engine = RuleEngine(rules)
+    assert len(engine.evaluate(reading(499.5, 0))) == 500
+    assert states(engine.evaluate(reading(500.5, 1))) == [("r500", "active")]
+    assert engine.evaluate(reading(500.7, 2)) == []
+    assert len(engine.evaluate(reading(-1, 3))) == 501
+    # Other sensors and non-numeric values are ignored
+    assert engine.evaluate(reading(2000, 4, sensor="hum")) == []
+    assert engine.evaluate(reading("n/a", 5)) == []
+
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError):
+        RuleEngine.from_config([{"name": "x", "sensor": "temp"}])
+    with pytest.raises(ValueError):
+        RuleEngine.from_config([{"name": "x", "type": "stuck"}])
+    with pytest.raises(ValueError):
+        RuleEngine.from_config([{"name": "x", "type": "spike", "above": 1}])
+
+
+def test_controller_publishes_alerts_before_reading():
+    mqtt_client = mock.Mock()
+    controller = GatewayController(
+        serial_reader=mock.Mock(),
+        mqtt_client=mqtt_client,
+        parser=MessageParser(device_id="arduino1", clock=lambda: 1700000000.0),
+        publish_topic="lab/device1/data",
+        rules=RuleEngine.from_config([{"name": "hot", "sensor": "temp", "above": 30}]),
+    )
+    controller.handle_line("temp:25")
+    controller.handle_line("temp:31")
+    calls = mqtt_client.publish.call_args_list
+    assert [c.args[0] for c in calls] == ["lab/device1/data", "lab/device1/alerts", "lab/device1/data"]
+    assert calls[1].kwargs == {"lane": "alerts"}
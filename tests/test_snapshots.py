@@ -0,0 +1,143 @@
+import threading
+
+import pytest
+
+from dashboard.snapshots import load_snapshot, save_snapshot
+
+
+def test_snapshot_round_trip_keeps_records_exact(tmp_path):
+    entries = [
+        (10.0, {"device": "d", "sensor": "A0", "value": 512, "timestamp": 1700000000.5, "seq": 0, "topic": "t"}),
+        (10.5, {"device": "d", "sensor": "A0", "value": 3, "seq": 1, "session": "boot1", "topic": "t"}),
+        (11.0, {"device": "d", "sensor": "temp", "value": 21.25, "timestamp": 1700000001.0, "topic": "t"}),
+        (12.0, {"sensor": "raw", "value": "hello", "timestamp": 1700000002.0, "topic": "t"}),
+        (13.0, {"device": "d", "sensor": "temp", "count": 3, "mean": 21.0, "topic": "t/agg"}),
+    ]
+    path = save_snapshot(tmp_path / "state.snapshot", entries, [], {"d": {"last_seq": 0}})
+    snapshot = load_snapshot(path)
+    assert snapshot.entries == entries
+    assert type(snapshot.entries[0][1]["value"]) is int
+    assert "session" not in snapshot.entries[0][1]
+    assert snapshot.sequences == {"d": {"last_seq": 0}}
+
+
+def test_load_snapshot_missing_and_invalid(tmp_path):
+    assert load_snapshot(tmp_path / "missing") is None
+    (tmp_path / "bad").write_bytes(b"not a snapshot")
+    with pytest.raises(ValueError):
+        load_snapshot(tmp_path / "bad")
+
+
+def test_handler_restores_before_live_data_without_duplicates(tmp_path, make_handler, deliver):
+    path = tmp_path / "dashboard.snapshot"
+    first = make_handler(path)
+    for seq in range(5):
+        deliver(first, {"device": "d", "sensor": "A0", "value": seq, "timestamp": 1700000000.0 + seq, "seq": seq})
+    deliver(first, {"device": "d", "sensor": "legacy", "value": 1, "timestamp": 1700000000.0})
+    assert first.save_snapshot() == path
+
+    second = make_handler(path)
+    assert second.restore_snapshot() == 6
+    assert second.latest.get("d", "A0").value == 4
+    # Redelivered messages are dropped, new ones are appended
+    deliver(second, {"device": "d", "sensor": "A0", "value": 4, "timestamp": 1700000004.0, "seq": 4})
+    deliver(second, {"device": "d", "sensor": "legacy", "value": 1, "timestamp": 1700000000.0})
+    deliver(second, {"device": "d", "sensor": "A0", "value": 5, "timestamp": 1700000005.0, "seq": 5})
+    df = second.to_dataframe()
+    assert list(df["value"]) == [0, 1, 2, 3, 4, 1, 5]
+    assert second.sequences.stats()["d"]["received"] == 6
+
+
+def test_restored_sequences_follow_the_gateway_session(tmp_path, make_handler, deliver):
+    path = tmp_path / "dashboard.snapshot"
+    first = make_handler(path)
+    for seq in range(50):
+        deliver(first, {"device": "d", "sensor": "A0", "value": seq, "seq": seq, "session": "boot1"})
+    for seq in range(50):
+        deliver(first, {"device": "old", "sensor": "A0", "value": seq, "seq": seq})
+    first.save_snapshot()
+
+    second = make_handler(path)
+    second.restore_snapshot()
+    deliver(second, {"device": "d", "sensor": "A0", "value": 49, "seq": 49, "session": "boot1"})
+    # The gateway restarted while the dashboard was down; its seq 0 was missed
+    deliver(second, {"device": "d", "sensor": "A0", "value": 1000, "seq": 3, "session": "boot2"})
+    # Without a session the restored count starts afresh instead of dropping seq 3
+    deliver(second, {"device": "old", "sensor": "A0", "value": 1000, "seq": 3})
+    stats = second.sequences.stats()
+    assert stats["d"]["duplicates"] == 1
+    assert stats["d"]["resets"] == 1
+    assert stats["old"]["duplicates"] == 0
+    assert second.latest.get("old", "A0").value == 1000
+
+
+def test_concurrent_saves_do_not_share_a_temporary_file(tmp_path):
+    path = tmp_path / "state.snapshot"
+    entries = [
+        (float(index), {"device": "d", "sensor": "A0", "value": index, "topic": "t"}) for index in range(2000)
+    ]
+    errors = []
+
+    def save():
+        try:
+            for _ in range(5):
+                save_snapshot(path, entries, [], {})
+        except Exception as exc:  # noqa: BLE001 - reported by the assertion below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=save) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert load_snapshot(path).entries == entries
+    assert [child.name for child in tmp_path.iterdir()] == ["state.snapshot"]
+
+
+def test_failed_save_is_logged_not_raised(tmp_path, monkeypatch, caplog, make_handler):
+    handler = make_handler(tmp_path / "dashboard.snapshot")
+
+    def changing_size():
+        raise RuntimeError("dictionary changed size during iteration")
+
+    monkeypatch.setattr(handler.latest, "export", changing_size)
+    assert handler.save_snapshot() is None
+    assert "Failed to save dashboard snapshot" in caplog.text
+
+
+def test_unreadable_snapshot_starts_empty(tmp_path, make_handler):
+    path = tmp_path / "dashboard.snapshot"
+    path.write_bytes(b"garbage")
+    handler = make_handler(path)
+    assert handler.restore_snapshot() == 0
+    assert not handler.buffer
+
+
+@pytest.mark.parametrize(
+    "latest, sequences",
+    [
+        ([{"device": "d", "sensor": "A0", "value": 1}], {}),
+        ([], {"d": {"received": "many", "last_seq": 3, "session": "boot1"}}),
+        ([], {"d": 3}),
+    ],
+)
+def test_snapshot_with_partial_rollups_starts_empty(tmp_path, make_handler, latest, sequences):
+    records = [(1.0, {"device": "d", "sensor": "A0", "value": 1, "timestamp": 10.0, "seq": 0, "topic": "t"})]
+    path = save_snapshot(tmp_path / "dashboard.snapshot", records, latest, sequences)
+    handler = make_handler(path)
+    assert handler.restore_snapshot() == 0
+    assert not handler.buffer
+    assert len(handler.latest) == 0
+    assert handler.sequences.stats() == {}
+
+
+def test_older_sequence_stats_are_completed_on_restore(tmp_path, make_handler, deliver):
+    records = [(1.0, {"device": "d", "sensor": "A0", "value": 1, "timestamp": 10.0, "seq": 0, "topic": "t"})]
+    # Written before restarts were counted
+    sequences = {"d": {"received": 1, "last_seq": 0, "session": "boot1", "gaps": 0, "missing": 0, "duplicates": 0}}
+    path = save_snapshot(tmp_path / "dashboard.snapshot", records, [], sequences)
+    handler = make_handler(path)
+    assert handler.restore_snapshot() == 1
+    deliver(handler, {"device": "d", "sensor": "A0", "value": 2, "timestamp": 11.0, "seq": 5, "session": "boot2"})
+    assert handler.sequences.stats()["d"]["resets"] == 1
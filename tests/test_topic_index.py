@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+from dashboard.topic_index import TopicTrie
+
+
+def test_exact_and_wildcard_filters_match():
+    trie = TopicTrie(["lab/device1/data/#", "lab/+/data/temperature", "lab/device2/data"])
+    assert sorted(trie.match("lab/device1/data/temperature")) == [
+        "lab/+/data/temperature",
+        "lab/device1/data/#",
+    ]
+    assert trie.match("lab/device1/data") == ["lab/device1/data/#"]
+    assert trie.match("lab/device2/data") == ["lab/device2/data"]
+    assert not trie.matches("lab/device2/data/humidity")
+
+
+def test_wildcards_do_not_match_system_topics():
+    trie = TopicTrie(["#", "+/broker"])
+    assert not trie.matches("$SYS/broker")
+    assert trie.matches("lab/broker")
+
+
+def test_remove_prunes_filter():
+    trie = TopicTrie(["lab/+/data/#"])
+    assert trie.matches("lab/device1/data/temp")
+    assert trie.remove("lab/+/data/#")
+    assert not trie.remove("lab/+/data/#")
+    assert len(trie) == 0
+    assert not trie.matches("lab/device1/data/temp")
+    assert list(trie) == []
+
+
+@pytest.mark.parametrize("topic_filter", ["", "lab/#/data", "lab/dev+"])
+def test_invalid_filters_are_rejected(topic_filter):
+    with pytest.raises(ValueError):
+        TopicTrie([topic_filter])
+
+
+def test_filters_change_while_another_thread_matches():
+    trie = TopicTrie(["lab/+/data/#"])
+    stop = threading.Event()
+    errors = []
+
+    def match_forever():
+        try:
+            while not stop.is_set():
+                trie.match("lab/device1/data/temp")
+                trie.match("lab/device1/data/humidity")
+        except Exception as exc:  # noqa: BLE001 - reported by the assertion below
+            errors.append(exc)
+
+    matcher = threading.Thread(target=match_forever)
+    matcher.start()
+    try:
+        for _ in range(2000):
+            trie.add("lab/device1/data/temp")
+            trie.add("lab/device1/data/+/raw")
+            trie.remove("lab/device1/data/+/raw")
+            trie.remove("lab/device1/data/temp")
+    finally:
+        stop.set()
+        matcher.join()
+    assert errors == []
+    # No result computed before the last change is left in the cache
+    assert trie.match("lab/device1/data/temp") == ["lab/+/data/#"]
+    assert list(trie) == ["lab/+/data/#"]